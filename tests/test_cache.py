@@ -0,0 +1,23 @@
+from wrapper import ResponseCache
+
+URL = "http://127.0.0.1:25510/hist/option/eod"
+PARAMS = {"root": "SPY", "exp": "20231215", "right": "C", "strike": 450000, "start_date": "20230103", "end_date": "20230104"}
+
+def test_size_counts_each_entry_once(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(URL, PARAMS, b"x"*1000)
+    cache.put(URL, PARAMS, b"y"*1000)
+    cache.put(URL, {**PARAMS, "strike": 455000}, b"z"*1000)
+    assert cache._size == cache._disk_size()
+
+    cache._remove(cache._path(next(cache._entries()).name))
+    assert cache._size == cache._disk_size()
+
+def test_refresh_does_not_evict(tmp_path, monkeypatch):
+    evictions = []
+    cache = ResponseCache(str(tmp_path), max_bytes=3000, level=0)
+    monkeypatch.setattr(cache, "_evict", lambda: evictions.append(cache._size))
+    for _ in range(5):
+        cache.put(URL, PARAMS, b"x"*2000)
+    assert evictions == []
+    assert cache.get(URL, PARAMS) == b"x"*2000
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+pytest.importorskip("numpy")
+
+from wrapper import Option,ResponseCache
+from wrapper.fetcher import AsyncFetcher
+from wrapper.metrics import RequestTimer
+
+DATA = json.dumps({"header": {"error_type": "null", "error_msg": "null", "format": ["ms_of_day","close","date"]}
+                   , "response": [[57_600_000, 1.5, 20230103]]}).encode()
+NO_DATA = json.dumps({"header": {"error_type": "NO_DATA", "error_msg": "No data for the specified timeframe & contract."}
+                      , "response": []}).encode()
+
+class _Response:
+    def __init__(self, raw):
+        self.status = 200
+        self.raw = raw
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self):
+        return self.raw
+
+class _Session:
+    # Stands for the aiohttp session - replies `raw` after `latency` seconds, or raises `error`
+    def __init__(self, raw=DATA, latency=0.0, error=None):
+        self.raw, self.latency, self.error = raw, latency, error
+        self.sent = 0
+
+    def get(self, url, params=None, timeout=None, trace_request_ctx=None):
+        self.sent += 1
+        session = self
+
+        class _Request:
+            async def __aenter__(self):
+                await asyncio.sleep(session.latency)
+                if session.error is not None:
+                    raise session.error
+                return _Response(session.raw)
+
+            async def __aexit__(self, *args):
+                pass
+        return _Request()
+
+class _FailingRateLimiter:
+    async def aacquire(self):
+        raise asyncio.TimeoutError()
+
+def _request(cache=None):
+    option = Option(root="SPY", exp="20231215", right="C", strike=450, _async=True, output="numpy", cache=cache)
+    option.get_hist_eod("20230103", "20230104")
+    return option._to_request()
+
+def _fetcher(baseline=0.05):
+    fetcher = AsyncFetcher(batch_size=32, timeout=5, max_retry=1, sleep=0, adaptive=True)
+    fetcher.limiter.limit = 8.0
+    fetcher.limiter.latency = fetcher.limiter.baseline = baseline
+    return fetcher
+
+def test_replies_feed_the_limit():
+    fetcher = _fetcher(baseline=0.015)
+    result = asyncio.run(fetcher._send(_request(), _Session(latency=0.02), None))
+    assert result["data"]["close"].tolist() == [1.5]
+    assert fetcher.limiter.latency > 0.015
+    assert fetcher.limiter.limit == 9
+    assert fetcher.limiter.in_flight == 0
+
+def test_cache_hits_and_no_data_replies_only_free_the_slot(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    request = _request(cache)
+    cache.put(request.url, request.params, DATA)
+
+    fetcher = _fetcher()
+    session = _Session()
+    assert asyncio.run(fetcher._send(request, session, None))["data"] is not None
+    assert asyncio.run(fetcher._send(_request(), _Session(raw=NO_DATA), None))["data"] is None
+    assert session.sent == 0
+    assert (fetcher.limiter.baseline, fetcher.limiter.limit, fetcher.limiter.in_flight) == (0.05, 8, 0)
+
+def test_transient_failures_after_send_decrease_the_limit():
+    fetcher = _fetcher()
+    with pytest.raises(aiohttp.ServerDisconnectedError):
+        asyncio.run(fetcher._send(_request(), _Session(error=aiohttp.ServerDisconnectedError()), None))
+    assert (fetcher.limiter.limit, fetcher.limiter.in_flight) == (4, 0)
+
+def test_failures_before_send_only_free_the_slot():
+    fetcher = _fetcher()
+    fetcher.rate_limiter = _FailingRateLimiter()
+    session = _Session()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(fetcher._send(_request(), session, None))
+    assert session.sent == 0
+    assert (fetcher.limiter.baseline, fetcher.limiter.limit, fetcher.limiter.in_flight) == (0.05, 8, 0)
+
+def test_stream_leaves_no_task_behind_when_the_consumer_goes_away(monkeypatch):
+    async def send(contract, session, timeout, timer=None):
+        if contract.params["strike"] == 450000:
+            return {"data": None, "url": None, "params": None}
+        await asyncio.sleep(60)
+
+    async def main():
+        fetcher = AsyncFetcher(batch_size=4, timeout=5, max_retry=1, sleep=0)
+        monkeypatch.setattr(fetcher, "_send", send)
+        requests = [_request()]
+        for strike in (455, 460):
+            option = Option(root="SPY", exp="20231215", right="C", strike=strike, _async=True)
+            option.get_hist_eod("20230103", "20230104")
+            requests.append(option._to_request())
+
+        results = []
+
+        async def consume():
+            async for idx, result in fetcher.stream(requests):
+                results.append(idx)
+
+        consumer = asyncio.create_task(consume())
+        while not results:
+            await asyncio.sleep(0.01)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
+
+def test_cache_reads_are_timed_apart_from_the_request(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+    fetcher = AsyncFetcher(batch_size=4, timeout=5, max_retry=1, sleep=0)
+
+    hit = _request(cache)
+    cache.put(hit.url, hit.params, DATA)
+    timer = RequestTimer(hit, "async")
+    asyncio.run(fetcher._fetch_task(hit, None, timer=timer))
+    assert timer.record["cache"] is not None and timer.record["cached"]
+    assert timer.record["ttfb"] is None and timer.record["download"] is None
+
+    miss = _request(cache)
+    miss.params["end_date"] = "20230105"
+    read = miss._read_cache
+
+    def slow_read():
+        time.sleep(0.05)
+        return read()
+    monkeypatch.setattr(miss, "_read_cache", slow_read)
+    timer = RequestTimer(miss, "async")
+    asyncio.run(fetcher._fetch_task(miss, _Session(), timer=timer))
+    assert timer.record["cache"] >= 0.05
+    assert timer.record["queue_wait"] < 0.05 and timer.record["download"] < 0.05
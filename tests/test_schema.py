@@ -0,0 +1,17 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wrapper.schema import _to_array
+
+def test_to_array_uses_the_compact_dtype():
+    assert _to_array([1, 2, 255], "uint8").dtype == "uint8"
+    assert _to_array([1.5, 2.25], "float32").dtype == "float32"
+    assert _to_array([3, 70], "category").dtype == "int16"
+
+@pytest.mark.parametrize("values,dtype", [([1, 300], "uint8"), ([-1, 2], "uint8"), ([1, 40000], "category")
+                                          , ([1.7, 2.0], "int32"), ([1.0, float("nan")], "int32")])
+def test_to_array_falls_back_when_values_dont_fit(values, dtype):
+    array = _to_array(values, dtype)
+    np.testing.assert_array_equal(array, np.asarray(values))
+    assert array.dtype == np.asarray(values).dtype
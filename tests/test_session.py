@@ -0,0 +1,43 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from wrapper import Stock,ThetaSession,get_default_session,set_default_session
+
+class _Terminal(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"header": {"error_type": "null", "error_msg": "null", "format": None}
+                           , "response": ["SPY"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def terminal():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Terminal)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_wrappers_follow_the_default_session(terminal):
+    previous = get_default_session()
+    stock = Stock(root="SPY")
+    session = ThetaSession(base_url=terminal)
+    try:
+        set_default_session(session)
+        assert previous.closed
+        assert stock.session is session
+        assert stock.get_list_roots() == [{"roots": "SPY"}]
+        assert stock.url.startswith(terminal)
+    finally:
+        set_default_session(None)
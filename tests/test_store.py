@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from wrapper import ParquetStore
+
+URL = "http://127.0.0.1:25510"
+
+def _bulk_result():
+    # Two strikes x both rights of one expiration, as parsed from a bulk endpoint in "numpy" output
+    return {
+        "url": f"{URL}/bulk_hist/option/eod"
+        ,"params": {"root": "SPY", "exp": "20231215", "start_date": "20230103", "end_date": "20230104"}
+        ,"data": {
+            "root": np.array(["SPY"]*8)
+            ,"exp": np.full(8, 20231215, dtype="int32")
+            ,"right": np.array(["C","C","P","P","C","C","P","P"])
+            ,"strike": np.array([450000,450000,450000,450000,455000,455000,455000,455000], dtype="int32")
+            ,"date": np.array([20230103,20230104]*4, dtype="int32")
+            ,"ms_of_day": np.zeros(8, dtype="int32")
+            ,"close": np.arange(8, dtype="float32")
+        }
+    }
+
+def test_write_result_splits_bulk_results_by_right(tmp_path):
+    store = ParquetStore(str(tmp_path))
+    paths = store.write_result(_bulk_result())
+    assert len(paths) == 2
+
+    calls = store.read("SPY", "eod", rights=["C"])
+    puts = store.read("SPY", "eod", rights=["P"], strikes=[455])
+    assert sorted(calls["close"]) == [0, 1, 4, 5]
+    assert sorted(puts["close"]) == [6, 7]
+    assert set(calls["strike"]) == {450000, 455000}
+
+def test_files_of_a_partition_share_one_schema(tmp_path):
+    import pyarrow.parquet as pq
+
+    store = ParquetStore(str(tmp_path))
+    paths = [
+        store.write({"date": np.array([date]), "ms_of_day": np.array([0]), "open_interest": np.array([open_interest])}
+                    , root="SPY", req_type="open_interest", exp="20231215", right="C", strike=450000)
+        for date, open_interest in ((20230103, 12), (20230104, 50000))
+    ]
+    schemas = [pq.read_schema(path) for path in paths]
+    assert schemas[0].equals(schemas[1])
+    assert schemas[0].field("open_interest").type == "int32"
+
+    df = store.read("SPY", "open_interest")
+    assert sorted(df["open_interest"]) == [12, 50000]
@@ -0,0 +1,41 @@
+import numpy as np
+
+from wrapper import TickStore
+
+URL = "http://127.0.0.1:25510/bulk_hist/option/quote"
+
+def _bulk_result(dates):
+    # Two contracts, rows ordered by the given dates then by contract - each contract comes as several runs
+    n = 2*len(dates)
+    return {
+        "url": URL
+        ,"params": {"root": "SPY", "exp": "20231215", "start_date": str(dates[0]), "end_date": str(dates[-1])}
+        ,"data": {
+            "root": np.array(["SPY"]*n)
+            ,"exp": np.full(n, 20231215, dtype="int32")
+            ,"right": np.array(["C","P"]*len(dates))
+            ,"strike": np.full(n, 450000, dtype="int32")
+            ,"date": np.repeat(np.asarray(dates, dtype="int32"), 2)
+            ,"ms_of_day": np.zeros(n, dtype="int32")
+            ,"bid": np.arange(n, dtype="float32")
+        }
+    }
+
+def test_fill_from_groups_interleaved_bulk_results(tmp_path, monkeypatch):
+    store = TickStore(str(tmp_path))
+    appends = []
+    append = store.append
+    monkeypatch.setattr(store, "append", lambda key, columns: appends.append(key) or append(key, columns))
+
+    assert store.fill_from([_bulk_result([20230104, 20230103])]) == 4
+    assert len(appends) == 2
+    # (idx, result) pairs, as collected from AsyncFetcher.stream
+    assert store.fill_from([(0, _bulk_result([20230105, 20230106])), (1, {"data": None, "url": None, "params": None})]) == 4
+
+    calls = store.slice("option_SPY_20231215_C_450000_quote", 20230103, 20230106)
+    puts = store.slice("option_SPY_20231215_P_450000_quote", 20230103, 20230106)
+    assert store.keys() == ["option_SPY_20231215_C_450000_quote", "option_SPY_20231215_P_450000_quote"]
+    assert calls["bid"].tolist() == [2, 0, 0, 2]
+    assert puts["bid"].tolist() == [3, 1, 1, 3]
+    assert calls["date"].tolist() == [20230103, 20230104, 20230105, 20230106]
+    assert "right" not in calls
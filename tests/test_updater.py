@@ -0,0 +1,52 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+from urllib.parse import urlparse,parse_qs
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+from wrapper import CsvStore,Stock,ThetaSession,sync_contract
+
+class _Terminal(BaseHTTPRequestHandler):
+    # Dates published by the terminal - extended by the test
+    dates = [20230103, 20230104]
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/list/dates/"):
+            header, response = {"format": None}, self.dates
+        else:
+            query = parse_qs(url.query)
+            first, last = int(query["start_date"][0]), int(query["end_date"][0])
+            header = {"format": ["ms_of_day","close","date"]}
+            response = [[57_600_000, 1.5, date] for date in self.dates if first <= date <= last]
+        body = json.dumps({"header": {"error_type": "null", "error_msg": "null", **header}, "response": response}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def terminal():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Terminal)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_sync_contract_sees_the_dates_published_since_the_last_sync(terminal, tmp_path, monkeypatch):
+    store = CsvStore(str(tmp_path))
+    with ThetaSession(base_url=terminal) as session:
+        stock = Stock(root="SPY", session=session)
+        assert sync_contract(stock, "get_hist_eod", store) == 2
+
+        monkeypatch.setattr(_Terminal, "dates", _Terminal.dates + [20230105])
+        assert sync_contract(stock, "get_hist_eod", store) == 1
+    assert store.dates(stock, "eod") == {20230103, 20230104, 20230105}
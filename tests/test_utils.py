@@ -0,0 +1,19 @@
+import datetime as dt
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from wrapper.utils import _format_date,_format_dates
+
+def test_format_dates_matches_format_date():
+    dates = ["20230103", "2023-01-04", "2023/01/05", 20230106, dt.date(2023, 1, 9), dt.datetime(2023, 1, 10, 16)
+             , "20240229", "19991231", "Jan 11 2023"]
+    assert _format_dates(dates) == [_format_date(date) for date in dates]
+    assert _format_dates(iter(["20230103"])) == ["20230103"]
+    assert _format_dates([]) == []
+
+@pytest.mark.parametrize("dates", [["20230103", "20230230"], [20230103, 20231301], [True], [20230103.5]])
+def test_format_dates_rejects_invalid_dates(dates):
+    with pytest.raises(ValueError):
+        _format_dates(dates)
@@ -1,6 +1,34 @@
-from .wrapper import MyWrapper,RootOrExpirationError,NoDataForContract
-from .option._option import StrikeError,RightError
+from .wrapper import MyWrapper,RootOrExpirationError,NoDataForContract,HTTPError
+from .option._option import StrikeError,RightError,BulkEndpointError
 from .option.option import Option,OptionError
 from .stock.stock import Stock
-from .utils import ResponseFormatError,IVLError,_format_date
-from .fetcher import AsyncFetcher
\ No newline at end of file
+from .utils import ResponseFormatError,IVLError,_format_date,set_json_decoder,to_timestamps,EXCHANGE_TZ
+from .schema import SCHEMAS,FIELD_DTYPES,register_schema,get_dtypes
+from .session import ThetaSession,get_default_session,set_default_session
+from .manifest import Manifest
+from .store import CsvStore,ParquetStore
+from .tickstore import TickStore
+from .updater import sync_contract,sync_contracts
+from .batch import fetch_many
+from .metrics import add_hook,remove_hook,MetricsRegistry,PHASES
+from .concurrency import AdaptiveLimit
+from .ratelimit import RateLimiter,get_default_rate_limiter,set_default_rate_limiter
+from .cache import ResponseCache,get_default_cache,set_default_cache,MetadataCache,METADATA_CACHE
+
+# Imported on first access - these pull heavy dependencies (aiohttp) that sync users never need
+_LAZY = {
+    "AsyncFetcher": ".fetcher",
+    "fetch_sharded": ".shard",
+    "ProcessFetcher": ".engine",
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
@@ -0,0 +1,80 @@
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor,as_completed
+from typing import List,Dict,Any,Iterable,Callable,Optional
+
+from .wrapper import NoDataForContract
+from .session import ThetaSession
+
+logger = logging.getLogger(__name__)
+
+def _fetch_one(request, session: Optional[ThetaSession]) -> Dict[str, Any]:
+    """
+    Sends one request in sync mode, on a copy so the request itself is left untouched.
+    """
+    contract = copy.copy(request)
+    contract._async = False
+    if session is not None:
+        contract.session = session
+    contract.request = contract.header = contract.response = None
+    try:
+        data = contract._get_data()
+    except NoDataForContract:
+        logger.debug("No data for contract - %s - %s", contract.__str__(), contract.params)
+        return {"data": None, "url": None, "params": None}
+    except Exception as e:
+        logger.error("Failed to fetch contract - %s - %s: %r", contract.__str__(), contract.params, e)
+        return {"data": None, "url": contract.url, "params": contract.params, "error": e}
+    logger.debug("Fetched data for contract - %s - %s", contract.__str__(), contract.params)
+    return {"data": data, "url": contract.url, "params": contract.params}
+
+def fetch_many(requests: Iterable[Any], max_workers: int = 8, session: Optional[ThetaSession] = None
+               , progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches many requests concurrently with a pool of threads sending the sync requests of MyWrapper - no
+    event loop involved, so it also runs as is in a notebook, where asyncio.run can't.
+
+    Parameters:
+    -----------
+    requests : Iterable[MyWrapper]
+        The requests to fetch - detached with `_to_request()` (see Option.fetch_chain), or planned contracts.
+        They can be in either mode: they are sent in sync mode on a copy, with their own output mode.
+    max_workers : int
+        Number of requests in flight at the same time.
+    session : ThetaSession, optional
+        Pooled session shared by the threads - defaults to the session of each request. Its pool_size should
+        be at least max_workers, or the extra connections are not kept alive.
+    progress : Callable[[int, int], None], optional
+        Called with (done, total) after each request, from the calling thread.
+
+    Returns:
+    --------
+    List[Dict[str, Any]]
+        The same results as AsyncFetcher.fetch_all_contracts, in the order of `requests`: the data, url and
+        params of each request, None values if it has no data, and the error if it failed - the other
+        requests are fetched anyway. Retries are left to the session (connection errors and 5xx).
+
+    Example:
+    --------
+    >>> requests = []
+    >>> for strike in Option(root="AAPL", exp="20230317").get_list_strikes():
+    ...     contract = Option(root="AAPL", exp="20230317", right="C", strike=strike["strikes"]/1000, _async=True)
+    ...     contract.get_hist_quote("20230101", "20230201", 60)
+    ...     requests.append(contract._to_request())
+    >>> results = fetch_many(requests, max_workers=8, progress=lambda done, total: print(f"{done}/{total}", end="\\r"))
+    """
+    requests = list(requests)
+    results = [None]*len(requests)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thetadata")
+    try:
+        futures = {executor.submit(_fetch_one, request, session): idx for idx, request in enumerate(requests)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(requests))
+    except BaseException:
+        # e.g. KeyboardInterrupt - drop the requests not started yet instead of waiting for all of them
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return results
@@ -0,0 +1,59 @@
+# Startup-time benchmark of `import wrapper`
+#
+# Usage: python wrapper/benchmark/bench_import.py [--runs 10] [--budget-ms 150]
+# Exits with 1 if the median import time goes above the budget or if a heavy dependency is imported eagerly.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must not be loaded by a bare `import wrapper`
+HEAVY_MODULES = ["pandas","numpy","dateparser","aiohttp","requests"]
+
+PROBE = """
+import sys,time
+t0 = time.perf_counter()
+import wrapper
+t1 = time.perf_counter()
+print((t1-t0)*1000)
+print(",".join(m for m in {heavy} if m in sys.modules))
+"""
+
+def measure_once():
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)]
+        ,cwd=REPO,capture_output=True,text=True,check=True
+    ).stdout.splitlines()
+    elapsed_ms = float(out[0])
+    loaded = [m for m in out[1].split(",") if m] if len(out) > 1 else []
+    return elapsed_ms, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs",type=int,default=10)
+    parser.add_argument("--budget-ms",type=float,default=150)
+    args = parser.parse_args()
+
+    timings, loaded = [], []
+    for _ in range(args.runs):
+        elapsed_ms, loaded = measure_once()
+        timings.append(elapsed_ms)
+
+    median = statistics.median(timings)
+    print(f"[+] import wrapper: median {median:.1f}ms - min {min(timings):.1f}ms - max {max(timings):.1f}ms over {args.runs} runs")
+
+    failed = False
+    if loaded:
+        print(f"[+] Heavy modules imported eagerly: {loaded}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"[+] Over budget: {median:.1f}ms > {args.budget_ms}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,226 @@
+# Throughput benchmark of the wrapper against the local mock terminal (mock_terminal.py).
+#
+# Measures, for the same synthetic chain of contracts:
+#   sync      - MyWrapper._get_data one request after the other, through the pooled ThetaSession
+#   async     - AsyncFetcher.fetch_all_contracts
+#   process   - ProcessFetcher.fetch_all_contracts, with --processes workers (skipped if 0)
+#   parse     - decode + header + parse of one payload, in each output mode
+#   assembly  - concatenation of the columnar results into one timestamp-indexed DataFrame
+# and reports requests/sec, MB/sec and the peak RSS of the process after each phase.
+#
+# Usage: python wrapper/benchmark/bench_throughput.py [--contracts 200] [--days 5] [--rows-per-day 1000]
+#                                                     [--latency-ms 5] [--error-rate 0] [--timeout-rate 0] [--processes 0]
+#                                                     [--save results.json] [--baseline results.json --tolerance 0.2]
+# Exits with 1 if a phase is slower than the baseline by more than the tolerance.
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+from wrapper.benchmark.mock_terminal import MockTerminal,STRIKES
+
+MB = 1024 * 1024
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+def trading_range(days: int, start: dt.date = dt.date(2023, 1, 2)):
+    """
+    (start_date, end_date) spanning `days` trading days from start.
+    """
+    end = start
+    while days > 1 or end.weekday() > 4:
+        end += dt.timedelta(days=1)
+        days -= end.weekday() < 5
+    return start.strftime("%Y%m%d"), end.strftime("%Y%m%d")
+
+def plan_chain(session, n_contracts: int, start_date: str, end_date: str, ivl: int, output: str):
+    """
+    The requests of a synthetic chain of n_contracts contracts, detached in async mode.
+    """
+    from wrapper import Option
+
+    requests = []
+    for idx in range(n_contracts):
+        strike = STRIKES[idx // 2 % len(STRIKES)] / 1000
+        option = Option(root="SPY", exp="20231215", right="CP"[idx % 2], strike=strike, _async=True, output=output, session=session)
+        option.get_hist_quote(start_date, end_date, ivl)
+        requests.append(option._to_request())
+    return requests
+
+def report(name: str, elapsed: float, requests: int, nbytes: int, rows: int = None):
+    result = {
+        "seconds": round(elapsed, 4)
+        ,"requests_per_sec": round(requests / elapsed, 2)
+        ,"mb_per_sec": round(nbytes / MB / elapsed, 2)
+        ,"peak_rss_mb": peak_rss_mb()
+    }
+    if rows is not None:
+        result["rows_per_sec"] = round(rows / elapsed)
+    rss = f"{result['peak_rss_mb']:.0f}MB" if result["peak_rss_mb"] is not None else "n/a"
+    print(f"[+] {name:<16} {result['requests_per_sec']:>10.1f} req/s {result['mb_per_sec']:>9.1f} MB/s  peak RSS {rss}  ({elapsed:.2f}s)")
+    return result
+
+def bench_sync(terminal, session, requests):
+    from wrapper import MyWrapper,NoDataForContract,HTTPError
+
+    before = terminal.stats()
+    start = time.perf_counter()
+    for request in requests:
+        contract = MyWrapper(output=request.output, session=session)
+        contract.call_type, contract.sec_type, contract.req_type = request.call_type, request.sec_type, request.req_type
+        contract.url, contract.params = request.url, dict(request.params)
+        try:
+            contract._get_data()
+        except (NoDataForContract, HTTPError):
+            pass
+    elapsed = time.perf_counter() - start
+    after = terminal.stats()
+    return report("sync _get_data", elapsed, after["requests"] - before["requests"], after["bytes"] - before["bytes"])
+
+def bench_async(terminal, requests, batch_size: int, timeout: float):
+    from wrapper import AsyncFetcher
+
+    fetcher = AsyncFetcher(batch_size=batch_size, timeout=timeout, max_retry=3, sleep=0.05, max_sleep=1)
+    before = terminal.stats()
+    start = time.perf_counter()
+    results = asyncio.run(fetcher.fetch_all_contracts(requests))
+    elapsed = time.perf_counter() - start
+    after = terminal.stats()
+    result = report("async fetch", elapsed, after["requests"] - before["requests"], after["bytes"] - before["bytes"])
+    result["failures"] = len(fetcher.failures)
+    return result, results
+
+def bench_process(terminal, requests, processes: int, batch_size: int, timeout: float):
+    from wrapper import ProcessFetcher
+
+    with ProcessFetcher(processes=processes, batch_size=batch_size, timeout=timeout, max_retry=3, sleep=0.05, max_sleep=1) as fetcher:
+        # Warm up - keeps the start of the workers out of the measure
+        asyncio.run(fetcher.fetch_all_contracts(requests[:processes]))
+        before = terminal.stats()
+        start = time.perf_counter()
+        asyncio.run(fetcher.fetch_all_contracts(requests))
+        elapsed = time.perf_counter() - start
+        after = terminal.stats()
+    result = report(f"process x{processes}", elapsed, after["requests"] - before["requests"], after["bytes"] - before["bytes"])
+    result["failures"] = len(fetcher.failures)
+    return result
+
+def bench_parse(session, request, repeat: int):
+    from wrapper import MyWrapper
+    from wrapper.metrics import _rows
+
+    raw = session.get(request.url, params=request.params).content
+    results = {}
+    for output in ("records", "numpy", "pandas"):
+        contract = MyWrapper(output=output, session=session)
+        contract.call_type, contract.sec_type, contract.req_type = request.call_type, request.sec_type, request.req_type
+        # Warm up - keeps the lazy imports of numpy/pandas out of the measure
+        contract._load_payload(raw)
+        contract._parse_header()
+        contract._parse_response()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            contract._load_payload(raw)
+            contract._parse_header()
+            data = contract._parse_response()
+        elapsed = time.perf_counter() - start
+        results[output] = report(f"parse {output}", elapsed, repeat, len(raw) * repeat, rows=_rows(data) * repeat)
+    return results
+
+def bench_assembly(results):
+    import pandas as pd
+    from wrapper.utils import _concat_columns,_set_timestamp_index
+
+    parts = [result["data"] for result in results if result.get("data")]
+    meta = [{"root": result["params"]["root"], "right": result["params"]["right"], "strike": result["params"]["strike"]}
+            for result in results if result.get("data")]
+    nbytes = sum(column.nbytes for part in parts for column in part.values())
+    start = time.perf_counter()
+    df = _set_timestamp_index(pd.DataFrame(_concat_columns(parts, meta), copy=False))
+    elapsed = time.perf_counter() - start
+    return report("assembly", elapsed, len(parts), nbytes, rows=len(df))
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Returns False if the throughput of a phase dropped by more than tolerance against the baseline.
+    """
+    okay = True
+    for name, result in results.items():
+        phases = result if "seconds" not in result else {None: result}
+        for output, phase in phases.items():
+            reference = baseline.get(name, {})
+            reference = reference.get(output, {}) if output else reference
+            if not isinstance(phase, dict) or "mb_per_sec" not in reference:
+                continue
+            if phase["mb_per_sec"] < reference["mb_per_sec"] * (1 - tolerance):
+                label = f"{name} {output}" if output else name
+                print(f"[+] Regression on {label}: {phase['mb_per_sec']} MB/s < {reference['mb_per_sec']} MB/s - {tolerance:.0%}")
+                okay = False
+    return okay
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark against the mock terminal")
+    parser.add_argument("--contracts",type=int,default=200)
+    parser.add_argument("--days",type=int,default=5)
+    parser.add_argument("--rows-per-day",type=int,default=1000)
+    parser.add_argument("--ivl",type=int,default=0,help="Interval in seconds - 0 for every tick")
+    parser.add_argument("--latency-ms",type=float,default=5.0)
+    parser.add_argument("--error-rate",type=float,default=0.0)
+    parser.add_argument("--timeout-rate",type=float,default=0.0)
+    parser.add_argument("--batch-size",type=int,default=32)
+    parser.add_argument("--processes",type=int,default=0,help="Workers of the process phase - 0 to skip it")
+    parser.add_argument("--timeout",type=float,default=10.0)
+    parser.add_argument("--output",default="numpy",choices=["records","numpy","pandas"])
+    parser.add_argument("--parse-repeat",type=int,default=20)
+    parser.add_argument("--port",type=int,default=25599)
+    parser.add_argument("--save",help="Write the results to this JSON file")
+    parser.add_argument("--baseline",help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance",type=float,default=0.2)
+    args = parser.parse_args()
+
+    from wrapper import ThetaSession
+
+    start_date, end_date = trading_range(args.days)
+    terminal = MockTerminal(
+        port=args.port, rows_per_day=args.rows_per_day, latency_ms=args.latency_ms
+        ,error_rate=args.error_rate, timeout_rate=args.timeout_rate, timeout_s=args.timeout * 2
+    )
+    print(f"[+] {args.contracts} contracts x {args.days} days x {args.rows_per_day} rows - latency {args.latency_ms}ms"
+          f" - errors {args.error_rate:.1%} - timeouts {args.timeout_rate:.1%}")
+
+    results = {}
+    with terminal, ThetaSession(base_url=terminal.base_url, pool_size=args.batch_size, timeout=args.timeout) as session:
+        requests = plan_chain(session, args.contracts, start_date, end_date, args.ivl, args.output)
+        results["parse"] = bench_parse(session, requests[0], args.parse_repeat)
+        results["sync"] = bench_sync(terminal, session, requests)
+        results["async"], fetched = bench_async(terminal, requests, args.batch_size, args.timeout)
+        if args.processes:
+            results["process"] = bench_process(terminal, requests, args.processes, max(1, args.batch_size // args.processes), args.timeout)
+        if args.output == "numpy":
+            results["assembly"] = bench_assembly(fetched)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.exit(0 if compare(results, baseline, args.tolerance) else 1)
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,250 @@
+# Local mock of the Theta Terminal REST API, for the benchmarks - no terminal or subscription needed.
+#
+# Serves /list/..., /hist/{option,stock}/..., /at_time/{option,stock}/... and /bulk_hist/option/... with
+# synthetic responses in the real {"header": {...}, "response": [...]} shape, using the formats of the
+# schema registry. Size, latency, error and timeout rates are configurable.
+#
+# Usage: python wrapper/benchmark/mock_terminal.py [--port 25599] [--rows-per-day 1000] [--latency-ms 5]
+#                                                  [--error-rate 0.01] [--timeout-rate 0.001]
+# or from Python:
+# >>> with MockTerminal(rows_per_day=1000, latency_ms=5) as terminal:
+# ...     session = ThetaSession(base_url=terminal.base_url)
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+import zlib
+from functools import lru_cache
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+from wrapper.schema import SCHEMAS
+
+# A regular session, in ms of day
+OPEN_MS = 34_200_000
+CLOSE_MS = 57_600_000
+
+STRIKES = [strike * 1000 for strike in range(50, 155, 5)]
+EXPIRATIONS = [20230120, 20230217, 20230317, 20230421, 20230616, 20230915, 20231215]
+ROOTS = ["AAPL","AMD","MSFT","QQQ","SPY","TSLA"]
+
+def _trading_days(start_date: int, end_date: int):
+    day = dt.datetime.strptime(str(start_date), "%Y%m%d").date()
+    end = dt.datetime.strptime(str(end_date), "%Y%m%d").date()
+    days = []
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(int(day.strftime("%Y%m%d")))
+        day += dt.timedelta(days=1)
+    return days
+
+def _format(sec_type: str, req_type: str):
+    schema = SCHEMAS.get((sec_type, req_type)) or SCHEMAS[("option","quote")]
+    return list(schema)
+
+def _value(field: str, dtype: str, rng: random.Random):
+    if dtype.startswith("float"):
+        return round(rng.uniform(0.5, 50), 2)
+    if dtype == "uint8" or dtype == "category":
+        return rng.randint(0, 60)
+    return rng.randint(1, 5000)
+
+@lru_cache(maxsize=256)
+def _rows(sec_type: str, req_type: str, days: tuple, rows_per_day: int, ivl: int):
+    """
+    Synthetic ticks of a request - memoized, so the mock's own cost stays out of the measure.
+    """
+    fmt = _format(sec_type, req_type)
+    dtypes = SCHEMAS.get((sec_type, req_type)) or SCHEMAS[("option","quote")]
+    # A stable digest - hash() changes with PYTHONHASHSEED, and so would the payloads from run to run
+    rng = random.Random(zlib.crc32("|".join([sec_type, req_type, *map(str, days)]).encode()))
+    step = ivl if ivl else max(1, (CLOSE_MS - OPEN_MS) // rows_per_day)
+    per_day = min(rows_per_day, max(1, (CLOSE_MS - OPEN_MS) // step))
+    rows = []
+    for day in days:
+        for i in range(per_day):
+            row = []
+            for field in fmt:
+                if field == "date":
+                    row.append(day)
+                elif field in ("ms_of_day","ms_of_day2"):
+                    row.append(OPEN_MS + i * step)
+                else:
+                    row.append(_value(field, dtypes[field], rng))
+            rows.append(row)
+    return fmt, rows
+
+def _payload(response, fmt=None, error_type="null", error_msg="null") -> bytes:
+    return json.dumps({"header": {"error_type": error_type, "error_msg": error_msg, "format": fmt}, "response": response}).encode()
+
+NO_DATA = _payload([], error_type="NO_DATA", error_msg="No data for the specified timeframe & contract.")
+
+def make_app(rows_per_day: int = 1000, latency_ms: float = 0.0, error_rate: float = 0.0, timeout_rate: float = 0.0
+             , timeout_s: float = 120.0, seed: int = 0):
+    """
+    Builds the aiohttp application of the mock terminal.
+
+    Args:
+        rows_per_day (int): Ticks per trading day of the hist endpoints, when no ivl is given (capped by the ivl otherwise).
+        latency_ms (float): Delay added to every response.
+        error_rate (float): Share of the requests answered with a 503.
+        timeout_rate (float): Share of the requests left hanging for timeout_s.
+        timeout_s (float): How long a "timed out" request hangs.
+        seed (int): Seed of the error/timeout draws.
+    """
+    from aiohttp import web
+
+    rng = random.Random(seed)
+
+    @lru_cache(maxsize=256)
+    def body(sec_type: str, req_type: str, days: tuple, rows_per_day: int, ivl: int) -> bytes:
+        fmt, rows = _rows(sec_type, req_type, days, rows_per_day, ivl)
+        return _payload(rows, fmt)
+
+    stats = {"requests": 0, "bytes": 0, "errors": 0, "timeouts": 0}
+
+    def reply(body: bytes):
+        stats["bytes"] += len(body)
+        return web.Response(body=body, content_type="application/json")
+
+    @web.middleware
+    async def faults(request, handler):
+        if request.path == "/__stats":
+            return await handler(request)
+        stats["requests"] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        draw = rng.random()
+        if draw < timeout_rate:
+            stats["timeouts"] += 1
+            await asyncio.sleep(timeout_s)
+        elif draw < timeout_rate + error_rate:
+            stats["errors"] += 1
+            return web.Response(status=503)
+        return await handler(request)
+
+    def days_of(query):
+        return tuple(_trading_days(int(query["start_date"]), int(query["end_date"])))
+
+    async def hist(request):
+        query = request.query
+        days = days_of(query)
+        if not days:
+            return reply(NO_DATA)
+        return reply(body(request.match_info["sec_type"], request.match_info["req_type"], days, rows_per_day, int(query.get("ivl", 0))))
+
+    async def at_time(request):
+        query = request.query
+        days = days_of(query)
+        if not days:
+            return reply(NO_DATA)
+        return reply(body(request.match_info["sec_type"], request.match_info["req_type"], days, 1, 0))
+
+    async def bulk_hist(request):
+        query = request.query
+        days = days_of(query)
+        if not days:
+            return reply(NO_DATA)
+        fmt, rows = _rows("option", request.match_info["req_type"], days, rows_per_day, int(query.get("ivl", 0)))
+        response = [
+            {"ticks": rows, "contract": {"root": query["root"], "expiration": int(query["exp"]), "strike": strike, "right": right}}
+            for strike in STRIKES for right in ("C","P")
+        ]
+        return reply(_payload(response, fmt))
+
+    async def list_dates(request):
+        return reply(_payload(list(_trading_days(20230102, 20231229))))
+
+    async def list_metadata(request):
+        lists = {"roots": ROOTS, "expirations": EXPIRATIONS, "strikes": STRIKES}
+        return reply(_payload(lists.get(request.match_info["req_type"], [])))
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(middlewares=[faults])
+    app.router.add_get("/hist/{sec_type}/{req_type}", hist)
+    app.router.add_get("/at_time/{sec_type}/{req_type}", at_time)
+    app.router.add_get("/bulk_hist/option/{req_type}", bulk_hist)
+    app.router.add_get("/list/dates/{sec_type}/{req_type}", list_dates)
+    app.router.add_get("/list/{req_type}", list_metadata)
+    app.router.add_get("/__stats", get_stats)
+    return app
+
+class MockTerminal:
+    def __init__(self,port: int = 25599,rows_per_day: int = 1000,latency_ms: float = 0.0,error_rate: float = 0.0
+                 ,timeout_rate: float = 0.0,timeout_s: float = 120.0,seed: int = 0):
+        """
+        Runs the mock terminal in a child process, so its CPU and memory stay out of the measures of the client.
+
+        Args:
+            port (int): Port to listen on, on 127.0.0.1.
+            rows_per_day, latency_ms, error_rate, timeout_rate, timeout_s, seed: See make_app.
+        """
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.args = [
+            "--port", str(port), "--rows-per-day", str(rows_per_day), "--latency-ms", str(latency_ms)
+            ,"--error-rate", str(error_rate), "--timeout-rate", str(timeout_rate), "--timeout-s", str(timeout_s)
+            ,"--seed", str(seed)
+        ]
+        self.process = None
+
+    def start(self,wait: float = 10.0):
+        self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), *self.args])
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            try:
+                self.stats()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError(f"[+] Mock terminal didn't start on port {self.port}")
+
+    def stats(self) -> dict:
+        """
+        Requests, bytes, errors and timeouts served so far.
+        """
+        with urllib.request.urlopen(f"{self.base_url}/__stats", timeout=1) as r:
+            return json.loads(r.read())
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.stop()
+
+def main():
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description="Mock Theta Terminal")
+    parser.add_argument("--port",type=int,default=25599)
+    parser.add_argument("--rows-per-day",type=int,default=1000)
+    parser.add_argument("--latency-ms",type=float,default=0.0)
+    parser.add_argument("--error-rate",type=float,default=0.0)
+    parser.add_argument("--timeout-rate",type=float,default=0.0)
+    parser.add_argument("--timeout-s",type=float,default=120.0)
+    parser.add_argument("--seed",type=int,default=0)
+    args = parser.parse_args()
+
+    app = make_app(args.rows_per_day, args.latency_ms, args.error_rate, args.timeout_rate, args.timeout_s, args.seed)
+    web.run_app(app, host="127.0.0.1", port=args.port, print=None, access_log=None)
+
+if __name__=='__main__':
+    main()
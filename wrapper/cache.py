@@ -0,0 +1,254 @@
+import datetime as dt
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional,Dict,Any,Tuple
+
+from .utils import _request_key
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "thetadata")
+
+# Each entry starts with the expiry of the entry (unix time, 0 = never expires)
+_HEADER = struct.Struct(">d")
+
+class ResponseCache:
+    def __init__(self,directory: str = DEFAULT_CACHE_DIR,max_bytes: int = 2*1024**3,ttl: float = 300,level: int = 1):
+        """
+        Persistent on-disk cache of the raw responses of the historical endpoints, keyed by (url, normalized params).
+
+        Queries whose `end_date` is in the past never change, so they are kept until evicted. Queries whose range
+        includes today are kept for `ttl` seconds only. Queries without an `end_date` (list endpoints) are not cached.
+
+        Parameters:
+        -----------
+        directory : str
+            Folder of the cache.
+        max_bytes : int
+            Size of the cache on disk. The least recently used entries are evicted above it.
+        ttl : float
+            Time to live, in seconds, of the queries including today.
+        level : int
+            zlib compression level of the entries.
+
+        Example:
+        --------
+        >>> set_default_cache(ResponseCache("~/.cache/thetadata", max_bytes=10*1024**3))
+        >>> Option("AAPL","20230317","C",150).get_hist_eod("20230101","20230201") # hits the terminal once
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.level = level
+        self._size = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self,key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _expires_at(self,params: Dict[str, Any]) -> Optional[float]:
+        """
+        Returns the expiry of a query: 0 if it is immutable, now+ttl if its range includes today, None if it
+        should not be cached.
+        """
+        end_date = (params or {}).get("end_date")
+        if end_date is None:
+            return None
+        if str(end_date) < dt.date.today().strftime("%Y%m%d"):
+            return 0
+        return time.time() + self.ttl
+
+    def get(self,url: str,params: Dict[str, Any]) -> Optional[bytes]:
+        """
+        Returns the raw response cached for the query, or None on a miss.
+        """
+        if self._expires_at(params) is None:
+            return None
+
+        path = self._path(_request_key(url, params))
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except FileNotFoundError:
+            return None
+
+        # A truncated or corrupted entry is a miss - dropped, so it gets fetched and written again
+        try:
+            (expires_at,) = _HEADER.unpack_from(blob)
+            if expires_at and expires_at < time.time():
+                self._remove(path)
+                return None
+            raw = zlib.decompress(blob[_HEADER.size:])
+        except (struct.error, zlib.error):
+            self._remove(path)
+            return None
+
+        # mtime is the recency used for the eviction
+        os.utime(path)
+        return raw
+
+    def put(self,url: str,params: Dict[str, Any],raw: bytes):
+        """
+        Stores the raw response of the query, if the query can be cached.
+        """
+        expires_at = self._expires_at(params)
+        if expires_at is None:
+            return
+
+        path = self._path(_request_key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        blob = _HEADER.pack(expires_at) + zlib.compress(raw, self.level)
+
+        # Write then rename, so a concurrent reader never sees a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        try:
+            # A refreshed entry replaces the previous one instead of adding to it
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        self._size = self._disk_size() if self._size is None else self._size + len(blob) - replaced
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        for folder in os.scandir(self.directory):
+            if folder.is_dir():
+                for entry in os.scandir(folder.path):
+                    if entry.is_file():
+                        yield entry
+
+    def _disk_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _remove(self,path: str):
+        try:
+            size = os.stat(path).st_size
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        if self._size is not None:
+            self._size = max(0, self._size - size)
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache is back to 90% of max_bytes.
+        """
+        entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries()))
+        size = sum(entry[1] for entry in entries)
+        target = 0.9*self.max_bytes
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            self._remove(path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for entry in list(self._entries()):
+            self._remove(entry.path)
+        self._size = 0
+
+_default_cache = None
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """
+    Returns the process-wide cache used by the wrappers created without a cache - None (no cache) by default.
+    """
+    return _default_cache
+
+def set_default_cache(cache: Optional[ResponseCache]):
+    """
+    Sets the process-wide cache used by the wrappers created without a cache. None disables it.
+    """
+    global _default_cache
+    _default_cache = cache
+
+
+METADATA_FIELDS = ("sec_type","req_type","root","exp","right","strike")
+
+def _matches(key: Tuple, fields: Dict[str, Any]) -> bool:
+    """
+    Tells if a METADATA_CACHE key matches the fields - sec_type and req_type are parts of the url, the
+    others are params.
+    """
+    url, params = key
+    path = url.split("/")
+    params = dict(params)
+    for field, value in fields.items():
+        if field in ("sec_type", "req_type"):
+            if value not in path:
+                return False
+        elif params.get(field) != str(value):
+            return False
+    return True
+
+class MetadataCache:
+    def __init__(self,maxsize: int = 4096,ttl: float = 3600):
+        """
+        Bounded in-memory LRU cache of the list endpoints (roots, expirations, strikes, dates), keyed by the query
+        sent - (url, normalized params), so two terminals never share entries. Shared by every wrapper of the process through METADATA_CACHE.
+
+        Parameters:
+        -----------
+        maxsize : int
+            Maximum number of entries - 0 disables the cache.
+        ttl : float
+            Time to live of an entry, in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self,key: Tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self,key: Tuple,value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self,key: Tuple):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self,**fields):
+        """
+        Removes the entries matching all the given fields, e.g. invalidate(root="SPY") or
+        invalidate(root="SPY", req_type="strikes"). Without fields, clears the cache.
+        """
+        unknown = set(fields) - set(METADATA_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown} - should be in {METADATA_FIELDS}")
+        with self._lock:
+            for key in [key for key in self._entries if _matches(key, fields)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+METADATA_CACHE = MetadataCache()
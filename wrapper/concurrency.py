@@ -0,0 +1,138 @@
+import asyncio
+import collections
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveLimit:
+    def __init__(self,min_limit: int = 1,max_limit: int = 64,initial: Optional[int] = None,backoff: float = 0.5
+                 ,tolerance: float = 2.0,smoothing: float = 0.1):
+        """
+        AIMD limit of the requests in flight, driven by the latency and the failures observed.
+
+        Starts in slow start (+1 per success, i.e. doubling every round trip) until the first sign of overload,
+        then grows by +1 per round trip. It is cut by `backoff` on a transient failure (timeout, dropped
+        connection, 429/5xx) or when the smoothed latency goes above `tolerance` times the baseline latency -
+        at most once per round trip, as the requests already in flight don't know about the cut yet.
+
+        Parameters:
+        -----------
+        min_limit, max_limit : int
+            Bounds of the limit.
+        initial : int, optional
+            Starting limit - defaults to min_limit.
+        backoff : float
+            Factor applied to the limit on overload.
+        tolerance : float
+            Ratio of the smoothed latency over the baseline latency above which the terminal is overloaded.
+        smoothing : float
+            Weight of the last latency in the smoothed latency.
+
+        Attributes:
+        -----------
+        limit : float
+            Current limit - the number of requests allowed in flight is int(limit).
+        in_flight : int
+            Requests currently in flight.
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Bounds must be 1 <= min_limit <= max_limit - got {min_limit} and {max_limit}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max_limit, max(min_limit, initial or min_limit)))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+
+        self.in_flight = 0
+        self.latency = None
+        self.baseline = None
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._waiters = collections.deque()
+        self._loop = None
+
+    def _reset(self):
+        # Waiters belong to one event loop - start over in a new one, keeping the limit (and what it learnt)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters = collections.deque()
+            self.in_flight = 0
+        return loop
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        for waiter in self._waiters:
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def acquire(self) -> float:
+        """
+        Waits for a free slot.
+
+        Returns:
+            float: The start time of the request, to give back to release.
+        """
+        loop = self._reset()
+        # A woken waiter can lose its slot to a newcomer - it then waits again
+        while self.in_flight >= int(self.limit):
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                # Hand the wake-up over to the next waiter
+                self._wake()
+                raise
+            finally:
+                self._waiters.remove(waiter)
+        self.in_flight += 1
+        return time.perf_counter()
+
+    def release(self,started: float,outcome: str,finished: Optional[float] = None):
+        """
+        Frees the slot of a request and adjusts the limit.
+
+        Args:
+            started (float): When the request was sent - by default, the time returned by acquire.
+            outcome (str): "ok" (a response of the terminal), "overload" (transient failure) or anything else,
+                e.g. "error" or "skip" (a failure or a reply which says nothing about the load of the terminal -
+                only frees the slot).
+            finished (float): When the response was received - defaults to now.
+        """
+        now = time.perf_counter() if finished is None else finished
+        self.in_flight = max(0, self.in_flight - 1)
+        if outcome == "overload":
+            self._decrease(started, now, "failure")
+        elif outcome == "ok":
+            self._observe(now - started, started, now)
+        self._wake()
+
+    def _observe(self,latency: float,started: float,now: float):
+        self.latency = latency if self.latency is None else self.latency + self.smoothing*(latency - self.latency)
+        # Lowest latency seen, drifting up slowly so a lasting change of the payloads doesn't look like overload
+        self.baseline = latency if self.baseline is None else min(latency, self.baseline + 0.01*(self.latency - self.baseline))
+        if self.latency > self.tolerance*self.baseline:
+            self._decrease(started, now, "latency")
+        elif self._slow_start:
+            self.limit = min(self.max_limit, self.limit + 1)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1/self.limit)
+
+    def _decrease(self,started: float,now: float,reason: str):
+        if started < self._last_decrease:
+            return
+        self._slow_start = False
+        self._last_decrease = now
+        limit = max(self.min_limit, self.limit*self.backoff)
+        if int(limit) != int(self.limit):
+            logger.debug("Concurrency limit %s -> %s (%s)", int(self.limit), int(limit), reason)
+        self.limit = limit
+        # Start the latency over from the baseline, or the cut is taken again on the same backlog
+        self.latency = self.baseline
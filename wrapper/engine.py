@@ -0,0 +1,419 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import List,Dict,Union,Any,Iterable,Tuple,Callable,Awaitable,AsyncIterator,Optional
+
+from .wrapper import MyWrapper,HTTPError
+from .metrics import _HOOKS,add_hook,remove_hook
+from .ratelimit import get_default_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Offsets of the columns in a shared memory block are aligned on a cache line
+_ALIGN = 64
+
+# State of a worker process, set once by _init_worker
+_WORKER = {}
+
+def _portable(error: BaseException) -> BaseException:
+    """
+    The error itself if it can be sent to the parent process, else a picklable stand-in (keeping the HTTP
+    status of the aiohttp errors, so the callers can still tell a 404 from a 503).
+    """
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        status = getattr(error, "status", None)
+        if status is not None:
+            return HTTPError(status)
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+def _spec(contract) -> Dict[str, Any]:
+    """
+    What a worker needs to send and parse a request - the contract itself holds a session that stays here.
+    """
+    return {
+        "call_type":contract.call_type
+        ,"sec_type":contract.sec_type
+        ,"req_type":contract.req_type
+        ,"url":contract.url
+        ,"params":contract.params
+        ,"cache":contract.cache
+        # Records are rebuilt from the columns - untyped, so the values come back exactly as decoded
+        ,"typed":contract.typed and contract.output != "records"
+    }
+
+def _init_worker(options: Dict[str, Any]):
+    """
+    Runs once in each worker process: one event loop and one AsyncFetcher for all its chunks, so the
+    adaptive limit keeps what it learnt from one chunk to the next.
+    """
+    from .fetcher import AsyncFetcher
+
+    _WORKER["loop"] = asyncio.new_event_loop()
+    _WORKER["fetcher"] = AsyncFetcher(**options)
+
+def _pack(results: List[Dict[str, Any]]):
+    """
+    Copies the columns of the results of a chunk into one shared memory block.
+
+    Returns:
+        The name of the block (None if there is nothing to share) and, for each result, the result without
+        its data plus the layout of its columns: (key, dtype, shape, offset, array) - array is only set for
+        the object and empty columns, which are pickled instead.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    size = 0
+    packed = []
+    for result in results:
+        data = result.pop("data", None)
+        layout = None
+        if data is not None:
+            layout = []
+            for key, column in data.items():
+                column = np.ascontiguousarray(column)
+                if column.dtype.hasobject or column.nbytes == 0:
+                    layout.append((key, None, None, None, column))
+                    continue
+                size = -(-size // _ALIGN) * _ALIGN
+                layout.append((key, column.dtype.str, column.shape, size, column))
+                size += column.nbytes
+        packed.append((result, layout))
+
+    name = None
+    if size:
+        # Registered with the resource tracker of the parent, which unlinks the block once copied - or when it
+        # exits, if the block is never read
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        name = shm.name
+        try:
+            for _, layout in packed:
+                for key, dtype, shape, offset, column in layout or ():
+                    if dtype is not None:
+                        target = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+                        target[...] = column
+                        del target
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+
+    entries = [(result, layout and [(key, dtype, shape, offset, column if dtype is None else None)
+                                    for key, dtype, shape, offset, column in layout]) for result, layout in packed]
+    return name, entries
+
+def _fetch_chunk(specs: List[Dict[str, Any]], collect: bool):
+    """
+    Fetches a chunk of requests in a worker process.
+
+    Returns:
+        The name of the shared memory block holding the columns, the results without their data (see _pack),
+        the failures of the fetcher and the metrics records, if collect.
+    """
+    fetcher = _WORKER["fetcher"]
+    requests = []
+    for spec in specs:
+        request = MyWrapper(_async=True, output="numpy", cache=spec["cache"], typed=spec["typed"], timestamps=False)
+        request.call_type, request.sec_type, request.req_type = spec["call_type"], spec["sec_type"], spec["req_type"]
+        request.url, request.params = spec["url"], spec["params"]
+        requests.append(request)
+
+    records = []
+    hook = records.append
+    if collect:
+        add_hook(hook)
+    try:
+        results = _WORKER["loop"].run_until_complete(fetcher.fetch_all_contracts(requests))
+    finally:
+        remove_hook(hook)
+
+    for result in results:
+        if "error" in result:
+            result["error"] = _portable(result["error"])
+    failures = [{**failure, "error": _portable(failure["error"])} for failure in fetcher.failures]
+    for record in records:
+        if record["error"] is not None:
+            record["error"] = _portable(record["error"])
+    name, entries = _pack(results)
+    return name, entries, failures, records
+
+def _unpack(name: Optional[str], entries):
+    """
+    Copies the columns of a chunk out of its shared memory block, then frees the block.
+
+    Returns:
+        For each result, the result without its data and its columns (None if it has no data).
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name) if name is not None else None
+    try:
+        unpacked = []
+        for result, layout in entries:
+            columns = None
+            if layout is not None:
+                columns = {}
+                for key, dtype, shape, offset, column in layout:
+                    if column is None:
+                        column = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+                    columns[key] = column
+            unpacked.append((result, columns))
+        return unpacked
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+def _discard(future):
+    """
+    Frees the shared memory of a chunk whose result nobody will read (the run was cancelled or failed).
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    name = future.result()[0]
+    if name is not None:
+        from multiprocessing import shared_memory
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+class ProcessFetcher():
+    def __init__(self,processes=None,batch_size=32,timeout=60,max_retry=3,sleep=1,max_sleep=60,manifest=None
+                 ,adaptive=False,min_batch_size=1,rate_limiter=None,chunk_size=None,start_method=None):
+        """
+        Fetches the contracts with a pool of processes, each running its own event loop and AsyncFetcher, so
+        decoding and parsing large responses (greeks, quotes) is spread over the cores instead of holding up
+        a single event loop.
+
+        The contracts are sent to the workers in chunks. A worker parses its responses in "numpy" output and
+        hands the columns back through one shared memory block per chunk - the parent only copies the arrays
+        out and converts them to the output mode of each contract, no rows are pickled.
+
+        Parameters:
+        -----------
+        processes : int, optional
+            Number of worker processes - defaults to os.cpu_count().
+        batch_size : int
+            Maximum number of requests in flight in each worker.
+        timeout, max_retry, sleep, max_sleep, adaptive, min_batch_size :
+            See AsyncFetcher - they apply to each worker.
+        manifest : Manifest, optional
+            Completion journal, used by the parent process - see AsyncFetcher.
+        rate_limiter : RateLimiter, optional
+            Request budget shared by the workers (and any other process using the same directory) - defaults
+            to the process-wide rate limiter of the parent, if any.
+        chunk_size : int, optional
+            Contracts per chunk - defaults to spreading each list in about 4 chunks per process, up to
+            4*batch_size contracts per chunk.
+        start_method : str, optional
+            multiprocessing start method of the workers - defaults to "forkserver" where available, else
+            "spawn". Like any process pool, scripts must create it under `if __name__ == "__main__":`.
+
+        Attributes:
+        -----------
+        failures : List[Dict]
+            Contracts of the last run that could not be fetched - see AsyncFetcher. The errors that cannot be
+            sent across processes are replaced by an HTTPError (with the same status) or a RuntimeError.
+
+        Example:
+        --------
+        >>> with ProcessFetcher(processes=16, batch_size=16, timeout=60) as fetcher:
+        ...     results = asyncio.run(fetcher.fetch_all_contracts(options))
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.start_method = start_method
+        self.options = {
+            "batch_size":batch_size
+            ,"timeout":timeout
+            ,"max_retry":max_retry
+            ,"sleep":sleep
+            ,"max_sleep":max_sleep
+            ,"adaptive":adaptive
+            ,"min_batch_size":min_batch_size
+            ,"rate_limiter":rate_limiter
+        }
+        self.failures = []
+        self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """
+        The worker processes - started on first use and reused by the next runs until close.
+        """
+        if self._pool is None:
+            from multiprocessing import resource_tracker
+            # Started before the workers so they share it - see _pack
+            resource_tracker.ensure_running()
+            options = dict(self.options)
+            options["rate_limiter"] = options["rate_limiter"] or get_default_rate_limiter()
+            self._pool = ProcessPoolExecutor(max_workers=self.processes
+                                             , mp_context=multiprocessing.get_context(self.start_method)
+                                             , initializer=_init_worker, initargs=(options,))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
+
+    def _chunk_size(self, contracts: Iterable[Any]) -> int:
+        if self.chunk_size:
+            return self.chunk_size
+        cap = 4 * self.batch_size
+        if not hasattr(contracts, "__len__"):
+            return cap
+        return max(1, min(cap, math.ceil(len(contracts) / (4 * self.processes))))
+
+    async def _chunks(self, contracts: Iterable[Any], emit: Callable[[int, Dict], Awaitable[None]]):
+        """
+        Yields chunks of (index, contract) to send to the workers - the contracts already in the manifest
+        are emitted right away instead.
+        """
+        size = self._chunk_size(contracts)
+        chunk = []
+        for idx, contract in enumerate(contracts):
+            if self.manifest is not None:
+                entry = await asyncio.to_thread(self.manifest.get, contract.url, contract.params)
+                if entry is not None:
+                    await emit(idx, {"data": None, "url": contract.url, "params": contract.params, "location": entry["location"], "resumed": True})
+                    continue
+            chunk.append((idx, contract))
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def _collect(self, chunk: List[Tuple[int, Any]], future, emit: Callable[[int, Dict], Awaitable[None]]):
+        """
+        Rebuilds the results of a chunk in the output mode of each contract, and emits them.
+        """
+        name, entries, failures, records = future.result()
+        for record in records:
+            for hook in list(_HOOKS):
+                try:
+                    hook(record)
+                except Exception:
+                    logger.exception("Metrics hook %r failed", hook)
+        for failure in failures:
+            failure["index"] = chunk[failure["index"]][0]
+            self.failures.append(failure)
+
+        for (idx, contract), (result, columns) in zip(chunk, _unpack(name, entries)):
+            result["data"] = contract._from_columns(columns) if columns is not None else None
+            if self.manifest is not None and "error" not in result:
+                result["location"] = await asyncio.to_thread(self.manifest.record, contract.url, contract.params, result["data"])
+            await emit(idx, result)
+
+    async def _run(self, contracts: Iterable[Any], emit: Callable[[int, Dict], Awaitable[None]]):
+        """
+        Sends the chunks to the workers, keeping 2 chunks per process queued at most, and emits the results of
+        each chunk as soon as it is done.
+        """
+        self.failures = []
+        pool = self.pool
+        running = {}
+        try:
+            async for chunk in self._chunks(contracts, emit):
+                while len(running) >= 2 * self.processes:
+                    await self._wait(running, emit)
+                future = pool.submit(_fetch_chunk, [_spec(contract) for _, contract in chunk], bool(_HOOKS))
+                running[asyncio.wrap_future(future)] = (chunk, future)
+            while running:
+                await self._wait(running, emit)
+        finally:
+            for chunk, future in running.values():
+                future.cancel()
+                future.add_done_callback(_discard)
+
+    async def _wait(self, running: Dict, emit: Callable[[int, Dict], Awaitable[None]]):
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in done:
+            chunk, future = running.pop(waiter)
+            await self._collect(chunk, future, emit)
+
+    async def fetch_all_contracts(self,contracts: List[Any]) -> List[Dict[str, Union[None, List[Any]]]]:
+        """
+        Fetches data for all contracts with the worker processes.
+
+        Parameters:
+        -----------
+        contracts : List[Contract] (Option or Stock)
+            List of Contract objects for which data needs to be fetched.
+
+        Returns:
+        --------
+        List[Dict[str, Union[None, List[Any]]]]
+            The same results as AsyncFetcher.fetch_all_contracts, in the same order as `contracts`.
+        """
+        results = [None]*len(contracts)
+
+        async def store(idx, result):
+            results[idx] = result
+
+        await self._run(contracts, store)
+        return results
+
+    async def stream(self, contracts: Iterable[Any], buffer_size: int = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Fetches the contracts with the worker processes and yields the results of each chunk as soon as it is
+        done - see AsyncFetcher.stream.
+
+        Parameters:
+        -----------
+        contracts : Iterable[Contract] (Option or Stock)
+            Contract objects for which data needs to be fetched - can be a generator.
+        buffer_size : int, optional
+            Maximum number of results waiting to be consumed - defaults to `batch_size`.
+
+        Yields:
+        -------
+        Tuple[int, Dict[str, Any]]
+            The index of the contract in `contracts` and its result, in completion order.
+        """
+        buffer = asyncio.Queue(maxsize=buffer_size or self.batch_size)
+
+        async def put(idx, result):
+            await buffer.put((idx, result))
+
+        producer = asyncio.create_task(self._run(contracts, put))
+        try:
+            while True:
+                getter = asyncio.ensure_future(buffer.get())
+                await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    continue
+
+                getter.cancel()
+                while not buffer.empty():
+                    yield buffer.get_nowait()
+                producer.result()
+                return
+        finally:
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
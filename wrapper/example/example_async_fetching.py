@@ -1,33 +1,12 @@
 # How to retrieve open interest
 
+import logging
 from wrapper import Option,AsyncFetcher
 
-import pandas as pd 
-import asyncio
-
-def get_option(args,strike,right,params_method,method):
-    args["strike"] = strike
-    args["right"] = right
-    args["_async"] = True
-    params = {"method":method,"params":params_method}
-    opt = Option(**args)
-    opt._get_method(**params)
-    return opt
-
-def get_df_tmp(contract):
-    url = contract.get("url")
-    if url:
-        data = contract.get("data")
-        params = contract.get("params")
-
-
-        df_tmp = pd.DataFrame(data)
-        df_tmp["url"] = url
-        for k,v in params.items():
-            df_tmp[k] = v
-        return df_tmp
-
 if __name__=='__main__':
+    # Progress of the fetch - DEBUG also logs every contract
+    logging.basicConfig(level=logging.INFO, format="[+] %(message)s")
+
     args = {
         "root":"AMD"
         ,"exp":"20230317"
@@ -47,23 +26,12 @@ if __name__=='__main__':
 
     method = "get_hist_open_interest"
 
-    # Init get strikes
+    # Plan and fetch every strike x right of the expiration over one session
+    # (in a notebook, where an event loop is already running, see wrapper.fetch_many instead)
     option = Option(**args)
-    strikes = [int(strike.get("strikes"))/1000 for strike in option.get_list_strikes()]
-
-    # Get options with url and params
-    options = [get_option(args,strike,right,params_method) for strike in strikes for right in ["call","put"]]
-    print(f"[+] About to fetch {len(options)} options...")
-
-    # Fetching responses
     fetcher = AsyncFetcher(**fetcher_params)
-    fetched_contracts = asyncio.run(fetcher.fetch_all_contracts(options))
-    print(f"[+] Fetched {len(fetched_contracts)} responses.")
-
-    # Format data 
-    df = pd.DataFrame()
-    df_tmps = [get_df_tmp(contract) for contract in fetched_contracts]
-    df = pd.concat(df_tmps,axis= 0)
+    df = option.fetch_chain(method,**params_method,fetcher=fetcher)
+    print(f"[+] Fetched {len(df)} rows - {len(fetcher.failures)} contracts failed.")
 
     # Save 
     root,exp = args.get("root"),args.get("exp")
@@ -1,18 +1,83 @@
 import asyncio 
+import contextlib
+import logging
+import random
+import time
 import aiohttp
 from .wrapper import NoDataForContract
-from typing import List,Dict,Union,Any
+from .metrics import _HOOKS,RequestTimer,_trace_config
+from .concurrency import AdaptiveLimit
+from .ratelimit import get_default_rate_limiter
+from typing import List,Dict,Union,Any,Iterable,Iterator,Tuple,Callable,Awaitable,AsyncIterator
 
+logger = logging.getLogger(__name__)
+
+TRANSIENT_STATUS = (429,500,502,503,504)
+
+def _is_transient(error: BaseException) -> bool:
+    """
+    Tells if a failed request is worth retrying: timeouts, dropped connections and 429/5xx responses.
+    """
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in TRANSIENT_STATUS
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, ConnectionResetError))
 
 class AsyncFetcher():
-    def __init__(self,batch_size,timeout,max_retry,sleep):
+    def __init__(self,batch_size,timeout,max_retry,sleep,max_sleep=60,manifest=None,adaptive=False,min_batch_size=1
+                 ,rate_limiter=None):
+        """
+        Parameters:
+        -----------
+        batch_size : int
+            Maximum number of requests in flight at the same time.
+        timeout : float
+            Timeout of a request, in seconds. Increased by itself after each timeout of a contract.
+        max_retry : int
+            Number of attempts per contract before giving up.
+        sleep : float
+            Base backoff before retrying a contract, in seconds. Doubles at each attempt, with jitter.
+        max_sleep : float
+            Upper bound of the backoff, in seconds.
+        manifest : Manifest, optional
+            Completion journal - each fetched contract is recorded in it as soon as it completes, and the
+            contracts already recorded are skipped, so an interrupted run can be resumed.
+        adaptive : bool
+            If True, the number of requests in flight is adjusted at runtime between `min_batch_size` and
+            `batch_size`, from the latency and the transient failures observed (see AdaptiveLimit). The limit
+            carries over to the next runs of the fetcher.
+        min_batch_size : int
+            Lower bound of the adaptive limit.
+        rate_limiter : RateLimiter, optional
+            Request budget shared with the other fetchers and processes of the machine - defaults to the
+            process-wide rate limiter, if any. Only the requests sent to the terminal use it, not the cache hits.
+
+        Attributes:
+        -----------
+        failures : List[Dict]
+            Contracts of the last run that could not be fetched, with the error and the number of attempts.
+        limiter : AdaptiveLimit
+            The adaptive limit, if adaptive - its `limit` is also in the metrics records of the requests.
+        """
         self.batch_size = batch_size
         self.timeout = timeout
         self.max_retry = max_retry
         self.sleep = sleep
+        self.max_sleep = max_sleep
+        self.manifest = manifest
+        self.failures = []
+        self.rate_limiter = rate_limiter
+        self.limiter = AdaptiveLimit(min_limit=min(min_batch_size, batch_size), max_limit=batch_size) if adaptive else None
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Jittered exponential backoff - between half and the whole of sleep*2^(attempt-1), capped to max_sleep.
+        """
+        delay = min(self.max_sleep, self.sleep * 2**(attempt-1))
+        return delay/2 + random.uniform(0, delay/2)
 
-    # Last time it run fine - DO NOT TOUCH
-    async def _fetch_task(self,contract, session):
+    async def _fetch_task(self,contract, session, timeout=None, timer=None, probe=None):
         """
         Fetches data for a single contract asynchronously.
 
@@ -22,6 +87,13 @@ class AsyncFetcher():
             The Contract object to fetch data for.
         session : aiohttp.ClientSession
             The aiohttp ClientSession object to use for making the request.
+        timeout : float, optional
+            Timeout of the request - defaults to `self.timeout`.
+        timer : RequestTimer, optional
+            Times each phase of the request, if given.
+        probe : dict, optional
+            Gets the time the request was sent ("sent", once the rate limiter let it through) and its response
+            received ("received") - left empty on a cache hit.
 
         Returns:
         --------
@@ -38,98 +110,245 @@ class AsyncFetcher():
         N/A
         """
 
-        r = await session.get(contract.url, params=contract.params, timeout=self.timeout)
-        if r.status != 200:
-            r.raise_for_status()
-        else:
+        raw = await asyncio.to_thread(contract._read_cache) if contract.cache is not None else None
+        cached = raw is not None
+        if timer is not None and contract.cache is not None:
+            timer.lap("cache")
+        if not cached:
+            limiter = self.rate_limiter or get_default_rate_limiter()
+            slot = await limiter.aacquire() if limiter is not None else None
+            if timer is not None:
+                timer.lap("queue_wait")
+            if probe is not None:
+                probe["sent"] = time.perf_counter()
             try:
-                _ = await r.json()
-                contract.header = _.get("header")
-                contract.response = _.get("response")
+                async with session.get(contract.url, params=contract.params, timeout=timeout or self.timeout
+                                       , trace_request_ctx=timer) as r:
+                    if r.status != 200:
+                        r.raise_for_status()
+                    raw = await r.read()
+            finally:
+                if limiter is not None:
+                    limiter.release(slot)
+            if probe is not None:
+                probe["received"] = time.perf_counter()
+        if timer is not None:
+            if not cached:
+                timer.lap("download")
+            timer.record["cached"] = cached
+            timer.record["bytes"] = len(raw)
+
+        try:
+            contract._load_payload(raw)
+            if timer is not None:
+                timer.lap("decode")
 
-                if contract._parse_header():
-                    data = contract._parse_response()
-                    print(f"[+] Fetched data for contract - {contract.__str__()} - {contract.params}")
-                    return {"data": data, "url": contract.url, "params": contract.params}
+            if contract._parse_header():
+                if not cached and contract.cache is not None:
+                    await asyncio.to_thread(contract._write_cache, raw)
+                    if timer is not None:
+                        timer.skip()
+                data = contract._parse_response()
+                if timer is not None:
+                    timer.lap("parse")
+                logger.debug("Fetched data for contract - %s - %s", contract.__str__(), contract.params)
+                return {"data": data, "url": contract.url, "params": contract.params}
 
-            except NoDataForContract:
-                print(f"[+] No data data for contract - {contract.__str__()} - {contract.params}")
-                return {"data": None, "url": None, "params": None}
-            
-            except Exception as e:
-                print(f"Failed to fetch data for contract - {contract.__str__()} - {contract.params}")
-                raise e
+        except NoDataForContract:
+            logger.debug("No data for contract - %s - %s", contract.__str__(), contract.params)
+            return {"data": None, "url": None, "params": None}
 
-    async def _fetch_batch(self, batch: List[Any]) -> List[Dict[str, Union[Any, str]]]:
+    async def _send(self, contract, session, timeout, timer=None):
         """
-        Fetch data for a batch of contracts asynchronously.
+        `_fetch_task` within a slot of the adaptive limit, if any. Only the requests that reach the terminal feed
+        the limit, timed from the moment the rate limiter let them through: cache hits and no-data replies
+        say nothing about its load.
+        """
+        if self.limiter is None:
+            return await self._fetch_task(contract, session, timeout, timer)
+
+        await self.limiter.acquire()
+        if timer is not None:
+            timer.lap("queue_wait")
+            timer.record["limit"] = int(self.limiter.limit)
+        probe = {}
+        outcome = "error"
+        try:
+            result = await self._fetch_task(contract, session, timeout, timer, probe)
+            outcome = "ok" if "received" in probe and result["url"] is not None else "skip"
+            return result
+        except Exception as e:
+            outcome = "overload" if "sent" in probe and _is_transient(e) else "error"
+            raise
+        finally:
+            self.limiter.release(probe.get("sent", 0.0), outcome, probe.get("received"))
+
+    async def _worker(self, pending: Iterator[Tuple[int, Any]], session: aiohttp.ClientSession
+                      , emit: Callable[[int, Dict], Awaitable[None]]):
+        """
+        Pulls contracts from `pending` until it is exhausted, so there are always up to `batch_size`
+        requests in flight - a slow contract only holds its own slot.
 
         Parameters:
         -----------
-        contracts : List[Contract]
-            A list of Contract objects to fetch data for.
+        pending : Iterator[Tuple[int, Contract]]
+            Iterator of (index, contract) to fetch, shared by all the workers.
+        session : aiohttp.ClientSession
+            The session shared by all the workers.
+        emit : Callable
+            Coroutine function called with (index, result) for each contract. Awaited before pulling the
+            next contract, so a slow consumer throttles the worker.
 
-        Returns:
-        --------
-        List[Dict[str, Union[Any, str]]]
-            A list of dictionaries containing the fetched data, the URL used for the request, and the parameters used for the request.
+        Notes:
+        ------
+        Transient errors (timeouts, dropped connections, 429/5xx) are retried up to `max_retry` attempts with a
+        jittered exponential backoff, the timeout growing after each timeout. Contracts that still fail, or fail
+        with any other error, are added to `self.failures` and get a result with no data.
+        """
+        for idx, contract in pending:
+            if self.manifest is not None:
+                entry = await asyncio.to_thread(self.manifest.get, contract.url, contract.params)
+                if entry is not None:
+                    await emit(idx, {"data": None, "url": contract.url, "params": contract.params, "location": entry["location"], "resumed": True})
+                    continue
 
-        Raises:
-        -------
-        N/A
+            timeout = self.timeout
+            for attempt in range(1, max(1, self.max_retry)+1):
+                # Only time the requests when someone listens
+                timer = RequestTimer(contract, "async", attempt=attempt) if _HOOKS else None
+                try:
+                    result = await self._send(contract, session, timeout, timer)
+                    if timer is not None:
+                        timer.done(result["data"])
+                    break
+                except Exception as e:
+                    if attempt < self.max_retry and _is_transient(e):
+                        sleep = self._backoff(attempt)
+                        if timer is not None:
+                            timer.done(error=e, outcome="retry")
+                        logger.warning("%s %s/%s for contract - %s .. retrying in %.1fsec", type(e).__name__, attempt, self.max_retry, contract.__str__(), sleep)
+                        if isinstance(e, asyncio.TimeoutError):
+                            timeout += self.timeout
+                        await asyncio.sleep(sleep)
+                        continue
 
+                    if timer is not None:
+                        timer.done(error=e)
+                    logger.error("Giving up on contract - %s - %s after %s attempt(s): %r", contract.__str__(), contract.params, attempt, e)
+                    self.failures.append({
+                        "index": idx
+                        ,"contract": contract.__str__()
+                        ,"url": contract.url
+                        ,"params": contract.params
+                        ,"error": e
+                        ,"attempts": attempt
+                        })
+                    result = {"data": None, "url": contract.url, "params": contract.params, "error": e}
+                    break
+
+            if self.manifest is not None and "error" not in result:
+                result["location"] = await asyncio.to_thread(self.manifest.record, contract.url, contract.params, result["data"])
+            await emit(idx, result)
+
+    async def _run(self, contracts: Iterable[Any], emit: Callable[[int, Dict], Awaitable[None]]):
+        """
+        Fetches all the contracts over a single session with `batch_size` workers, emitting each result as
+        soon as it is parsed.
         """
-        tasks = []
+        self.failures = []
+        pending = iter(enumerate(contracts))
+
         connector = aiohttp.TCPConnector(limit_per_host=self.batch_size)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            for contract in batch:
-                
-                task = asyncio.create_task(self._fetch_task(contract, session))
-                tasks.append(task)
-            results = await asyncio.gather(*tasks)
-        return results
+        trace_configs = [_trace_config()] if _HOOKS else None
+        async with aiohttp.ClientSession(connector=connector, trace_configs=trace_configs) as session:
+            workers = [asyncio.create_task(self._worker(pending, session, emit)) for _ in range(self.batch_size)]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
 
     async def fetch_all_contracts(self,contracts: List[Any]) -> List[Dict[str, Union[None, List[Any]]]]:
         """
-        Fetches data for all contracts asynchronously.
+        Fetches data for all contracts asynchronously over a single session, keeping up to
+        `batch_size` requests in flight at any time.
 
         Parameters:
         -----------
-        contracts_in_exp : List[Contract] (Option or Stock)
+        contracts : List[Contract] (Option or Stock)
             List of Contract objects for which data needs to be fetched.
 
         Returns:
         --------
         List[Dict[str, Union[None, List[Any]]]]
-            A list of dictionaries containing fetched data, URL, and parameters for each contract in `contracts_in_exp`. 
+            A list of dictionaries containing fetched data, URL, and parameters for each contract in `contracts`,
+            in the same order as `contracts`.
             If no data is available for a contract, then the dictionary will contain None values.
+            If the contract could not be fetched, the dictionary has no data and the error - see `self.failures`.
+            With a manifest, the contracts completed by a previous run have no data but the `location` of their
+            data (see Manifest.load) and `resumed` set to True.
+        """
+        results = [None]*len(contracts)
 
-        Raises:
+        async def store(idx, result):
+            results[idx] = result
+
+        await self._run(contracts, store)
+        return results
+
+    async def stream(self, contracts: Iterable[Any], buffer_size: int = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Fetches the contracts asynchronously and yields each result as soon as it is parsed, instead of
+        keeping every result in memory until the end.
+
+        Parameters:
+        -----------
+        contracts : Iterable[Contract] (Option or Stock)
+            Contract objects for which data needs to be fetched - can be a generator.
+        buffer_size : int, optional
+            Maximum number of parsed results waiting to be consumed - defaults to `batch_size`. When the buffer
+            is full, the workers wait for the consumer before fetching more contracts.
+
+        Yields:
         -------
-        asyncio.TimeoutError:
-            If the maximum number of retries have been exceeded.
+        Tuple[int, Dict[str, Any]]
+            The index of the contract in `contracts` and the same dictionary as `fetch_all_contracts`.
+            Results come in completion order, not in input order.
+
+        Example:
+        --------
+        >>> async for idx, result in fetcher.stream(options):
+        ...     write(result)
         """
-        data = []
-        timeout_incr,sleep_incr = self.timeout,self.sleep
-        i, attempt,last_success_batch_idx = self.max_retry, 0,0
-        while i > 0:
-            try:
-                
-                while last_success_batch_idx < len(contracts):
-                    batch = contracts[last_success_batch_idx:last_success_batch_idx+self.batch_size]
-                    results = await self._fetch_batch(batch)
-                    data.extend(results)
-                    last_success_batch_idx += self.batch_size
-                break
-            except asyncio.TimeoutError:
-                i -= 1
-                self.timeout += timeout_incr
-                self.sleep += sleep_incr
-                attempt += 1
-                if i>0:
-                    print(f"[+] Timed out {attempt}/{self.max_retry} .. going to sleep for {self.sleep}sec")
-                    await asyncio.sleep(self.sleep)
-        else:
-            print(f"[+] Max retries reached. Giving up")
-            raise asyncio.TimeoutError
-        return data
+        buffer = asyncio.Queue(maxsize=buffer_size or self.batch_size)
+
+        async def put(idx, result):
+            await buffer.put((idx, result))
+
+        producer = asyncio.create_task(self._run(contracts, put))
+        getter = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(buffer.get())
+                await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    continue
+
+                # Every worker is done - flush the buffer and surface their error, if any
+                getter.cancel()
+                while not buffer.empty():
+                    yield buffer.get_nowait()
+                producer.result()
+                return
+        finally:
+            # The consumer went away (break, cancellation) - nothing should be left waiting on the buffer
+            if getter is not None and not getter.done():
+                getter.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await getter
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,115 @@
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional,Dict,Any
+
+from .utils import _request_key
+
+class Manifest:
+    def __init__(self,path: str,data_dir: Optional[str] = None):
+        """
+        Completion journal of a download, keyed by (url, normalized params), to resume a run where it stopped.
+
+        Each request is recorded as soon as it completes, with the number of rows and the location of its data.
+        An AsyncFetcher given the manifest skips the requests already recorded.
+
+        Parameters:
+        -----------
+        path : str
+            SQLite file of the journal - created if missing.
+        data_dir : str, optional
+            Folder where the data of each request is written (one pickle per request). Without it, only the
+            completion is recorded and the caller is in charge of persisting the results.
+
+        Example:
+        --------
+        >>> with Manifest("./backfill.sqlite", data_dir="./backfill") as manifest:
+        ...     fetcher = AsyncFetcher(batch_size=32, timeout=60, max_retry=3, sleep=1, manifest=manifest)
+        ...     results = asyncio.run(fetcher.fetch_all_contracts(options)) # re-run after a crash: only the rest is fetched
+        """
+        self.path = path
+        self.data_dir = data_dir
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS requests (
+                key TEXT PRIMARY KEY
+                ,url TEXT NOT NULL
+                ,params TEXT NOT NULL
+                ,status TEXT NOT NULL
+                ,rows INTEGER
+                ,location TEXT
+                ,completed_at REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self,url: str,params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the entry of a completed request, or None if it still has to be fetched.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url,params,status,rows,location,completed_at FROM requests WHERE key = ?"
+                ,(_request_key(url, params),)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("url","params","status","rows","location","completed_at"), row), params=json.loads(row[1]))
+
+    def record(self,url: str,params: Dict[str, Any],data: Any) -> Optional[str]:
+        """
+        Records a completed request - "done" with its data, or "empty" if the terminal had no data for it.
+        The data is written first, so a recorded request always has its data on disk.
+
+        Returns:
+            str: The location of the data, if written.
+        """
+        key = _request_key(url, params)
+        location = None
+        if data is not None and self.data_dir:
+            location = os.path.join(self.data_dir, f"{key}.pkl")
+            fd, tmp_path = tempfile.mkstemp(dir=self.data_dir)
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, location)
+
+        rows = None if data is None else len(data) if not isinstance(data, dict) else len(next(iter(data.values()), []))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO requests VALUES (?,?,?,?,?,?,?)"
+                ,(key, url, json.dumps(params, default=str), "empty" if data is None else "done", rows, location, time.time())
+            )
+        return location
+
+    @staticmethod
+    def load(location: str) -> Any:
+        """
+        Loads the data written for a request.
+        """
+        with open(location, "rb") as f:
+            return pickle.load(f)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM requests").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
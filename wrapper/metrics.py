@@ -0,0 +1,223 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Callable,Dict,Any,Optional,Tuple
+
+logger = logging.getLogger(__name__)
+
+# Timed phases of a request, in order
+PHASES = ("cache","queue_wait","connect","ttfb","download","decode","parse")
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0,30.0,60.0)
+
+_HOOKS = []
+
+def add_hook(hook: Callable[[Dict[str, Any]], None]):
+    """
+    Registers a callable receiving the record of every request sent by MyWrapper._get_data and the
+    AsyncFetcher. Without any hook, requests are not timed at all.
+
+    A record is a dict with:
+        mode ("sync" or "async"), url, params, sec_type, req_type, call_type,
+        outcome ("ok", "no_data", "retry" or "error"), error (the exception, if any), attempt, cached,
+        bytes, rows, total and the seconds spent in each of PHASES (None when not measured, e.g. connect
+        for the sync requests, whose connections are handled by urllib3). cache is the read of the disk cache,
+        queue_wait is the wait for the rate limiter (and, for the AsyncFetcher, for a free connection of the
+        pool and for the adaptive limit), and limit is the concurrency limit of an adaptive fetcher.
+
+    Args:
+        hook (callable): Called with each record, from the thread or event loop of the request - keep it cheap.
+    """
+    if hook not in _HOOKS:
+        _HOOKS.append(hook)
+
+def remove_hook(hook: Callable[[Dict[str, Any]], None]):
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+def _rows(data: Any) -> Optional[int]:
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        return len(next(iter(data.values()), []))
+    return len(data)
+
+class RequestTimer:
+    __slots__ = ("record","_start","_last")
+
+    def __init__(self,contract,mode: str,attempt: int = 1):
+        """
+        Times the phases of one request and sends its record to the hooks once done.
+
+        Args:
+            contract (MyWrapper): The request.
+            mode (str): "sync" or "async".
+            attempt (int): Attempt number of the request.
+        """
+        now = time.perf_counter()
+        self.record = {
+            "mode":mode
+            ,"url":contract.url
+            ,"params":contract.params
+            ,"sec_type":contract.sec_type
+            ,"req_type":contract.req_type
+            ,"call_type":contract.call_type
+            ,"outcome":None
+            ,"error":None
+            ,"attempt":attempt
+            ,"cached":False
+            ,"bytes":0
+            ,"rows":None
+            ,"total":None
+            ,"limit":None
+            ,**{phase: None for phase in PHASES}
+        }
+        self._start = self._last = now
+
+    def lap(self,phase: str):
+        """
+        Adds the time since the previous lap to `phase`.
+        """
+        now = time.perf_counter()
+        self.record[phase] = (self.record[phase] or 0.0) + now - self._last
+        self._last = now
+
+    def skip(self):
+        """
+        Drops the time since the previous lap (e.g. writing the cache).
+        """
+        self._last = time.perf_counter()
+
+    def done(self,data: Any = None,error: Optional[BaseException] = None,outcome: Optional[str] = None):
+        record = self.record
+        record["total"] = time.perf_counter() - self._start
+        record["error"] = error
+        record["rows"] = _rows(data)
+        record["outcome"] = outcome or ("error" if error is not None else "no_data" if data is None else "ok")
+        for hook in list(_HOOKS):
+            try:
+                hook(record)
+            except Exception:
+                logger.exception("Metrics hook %r failed", hook)
+
+def _trace_config():
+    """
+    aiohttp TraceConfig timing the connection pool wait, the connection and the time to first byte of the
+    requests sent with a RequestTimer as trace_request_ctx.
+    """
+    import aiohttp
+
+    def _timer(context):
+        return context.trace_request_ctx
+
+    async def on_queued_start(session, context, params):
+        timer = _timer(context)
+        if timer is not None:
+            timer.skip()
+
+    async def on_queued_end(session, context, params):
+        timer = _timer(context)
+        if timer is not None:
+            timer.lap("queue_wait")
+
+    async def on_create_start(session, context, params):
+        timer = _timer(context)
+        if timer is not None:
+            timer.skip()
+
+    async def on_create_end(session, context, params):
+        timer = _timer(context)
+        if timer is not None:
+            timer.lap("connect")
+
+    async def on_request_end(session, context, params):
+        timer = _timer(context)
+        if timer is not None:
+            timer.lap("ttfb")
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_queued_start.append(on_queued_start)
+    trace_config.on_connection_queued_end.append(on_queued_end)
+    trace_config.on_connection_create_start.append(on_create_start)
+    trace_config.on_connection_create_end.append(on_create_end)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+class MetricsRegistry:
+    def __init__(self,buckets: Tuple[float, ...] = DEFAULT_BUCKETS,prefix: str = "thetadata"):
+        """
+        Prometheus-style aggregation of the request records - counters of requests, bytes and rows, and a
+        latency histogram per phase. Register it with add_hook, and expose render() on a /metrics endpoint
+        or push it to a gateway.
+
+        Example:
+        --------
+        >>> registry = MetricsRegistry()
+        >>> add_hook(registry)
+        >>> results = asyncio.run(fetcher.fetch_all_contracts(options))
+        >>> print(registry.render())
+        """
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.bytes = {}
+            self.rows = {}
+            self.limit = None
+            # (phase, req_type) -> [bucket counts..., +Inf count, sum]
+            self.latency = {}
+
+    def __call__(self,record: Dict[str, Any]):
+        labels = (record["mode"], record["req_type"] or "", record["outcome"])
+        req_type = record["req_type"] or ""
+        with self._lock:
+            self.requests[labels] = self.requests.get(labels, 0) + 1
+            self.bytes[req_type] = self.bytes.get(req_type, 0) + record["bytes"]
+            if record["limit"] is not None:
+                self.limit = record["limit"]
+            if record["rows"]:
+                self.rows[req_type] = self.rows.get(req_type, 0) + record["rows"]
+            for phase in PHASES + ("total",):
+                seconds = record[phase]
+                if seconds is None:
+                    continue
+                histogram = self.latency.get((phase, req_type))
+                if histogram is None:
+                    histogram = self.latency[(phase, req_type)] = [0]*(len(self.buckets)+1) + [0.0]
+                histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+                histogram[-1] += seconds
+
+    def render(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        name = self.prefix
+        lines = [f"# TYPE {name}_requests_total counter"]
+        with self._lock:
+            for (mode, req_type, outcome), count in sorted(self.requests.items()):
+                lines.append(f'{name}_requests_total{{mode="{mode}",req_type="{req_type}",outcome="{outcome}"}} {count}')
+            lines.append(f"# TYPE {name}_response_bytes_total counter")
+            for req_type, count in sorted(self.bytes.items()):
+                lines.append(f'{name}_response_bytes_total{{req_type="{req_type}"}} {count}')
+            lines.append(f"# TYPE {name}_rows_total counter")
+            for req_type, count in sorted(self.rows.items()):
+                lines.append(f'{name}_rows_total{{req_type="{req_type}"}} {count}')
+            if self.limit is not None:
+                lines.append(f"# TYPE {name}_concurrency_limit gauge")
+                lines.append(f"{name}_concurrency_limit {self.limit}")
+            lines.append(f"# TYPE {name}_request_seconds histogram")
+            for (phase, req_type), histogram in sorted(self.latency.items()):
+                labels = f'phase="{phase}",req_type="{req_type}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), histogram[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_request_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_request_seconds_sum{{{labels}}} {histogram[-1]}")
+                lines.append(f"{name}_request_seconds_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
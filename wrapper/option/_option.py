@@ -1,7 +1,10 @@
 from typing import List
 
 from ..utils import _format_date,_format_ivl,_isDateRangeValid
-from ..wrapper import MyWrapper
+from ..wrapper import MyWrapper,HTTPError
+
+# Statuses telling the terminal doesn't serve a bulk endpoint (older terminal, subscription, ...)
+BULK_UNAVAILABLE_STATUS = (403,404,410,501)
 
 class OptionError(Exception):
     pass
@@ -12,6 +15,9 @@ class RightError(Exception):
 class StrikeError(Exception):
     pass
 
+class BulkEndpointError(Exception):
+    pass
+
 class Option(MyWrapper):
     def __init__(self,root="SPY",exp=None,right=None,strike=None,*args,**kwargs):
         super().__init__(*args,**kwargs)
@@ -64,7 +70,7 @@ class Option(MyWrapper):
             raise StrikeError("Strike price must be an integer or a float")
         if self.strike < 0:
             raise StrikeError("Strike price must be non-negative")
-        return int(self.strike*1000)
+        return int(round(self.strike*1000))
     
     def _isOptionValid(self):
         if _format_date(self.exp) and self._format_right() and self._format_strike():
@@ -153,6 +159,36 @@ class Option(MyWrapper):
         }
         return self._get_data()
     
+    def _get_bulk_hist(self,start_date,end_date,ivl=None):
+        """
+        Retrieves the history of every contract of an expiration in one request - minimum {root,expiry}
+        """
+        self.call_type = "bulk_hist"
+
+        _start_date = _format_date(start_date)
+        _end_date = _format_date(end_date)
+
+        if not self._exp:
+            raise OptionError("Expiry is not valide")
+        if not self._isOptionRangeValid(_start_date,_end_date):
+            raise OptionError("The start_date end_date and expiry are not valid")
+
+        self.url = f"{self.base_url}/{self.call_type}/{self.sec_type}/{self.req_type}"
+        self.params = {
+            "start_date":_start_date
+            ,"end_date":_end_date
+            ,"root":self.root
+            ,"exp":self._exp
+        }
+        if ivl is not None:
+            self.params["ivl"] = _format_ivl(ivl)
+        try:
+            return self._get_data()
+        except HTTPError as e:
+            if e.status_code in BULK_UNAVAILABLE_STATUS:
+                raise BulkEndpointError(f"[+] {self.url} is not available on this terminal") from e
+            raise
+
     # List endpoints
     def get_list_roots(self) -> List[str]:
         """
@@ -301,6 +337,32 @@ class Option(MyWrapper):
         self.req_type = "eod_quote_greeks"
         return self._get_hist(start_date,end_date,ivl)
     
+    # Bulk hist endpoints - every strike and right of the expiration at once
+    def get_bulk_hist_eod(self,start_date,end_date):
+        self.req_type = "eod"
+        return self._get_bulk_hist(start_date,end_date)
+
+    def get_bulk_hist_open_interest(self,start_date,end_date):
+        self.req_type = "open_interest"
+        return self._get_bulk_hist(start_date,end_date)
+
+    def get_bulk_hist_ohlc(self,start_date,end_date):
+        ivl = 3600 # same default as get_hist_ohlc
+        self.req_type = "ohlc"
+        return self._get_bulk_hist(start_date,end_date,ivl)
+
+    def get_bulk_hist_quote(self,start_date,end_date,ivl):
+        self.req_type = "quote"
+        return self._get_bulk_hist(start_date,end_date,ivl)
+
+    def get_bulk_hist_trade(self,start_date,end_date,ivl):
+        self.req_type = "trade"
+        return self._get_bulk_hist(start_date,end_date,ivl)
+
+    def get_bulk_hist_greeks(self,start_date,end_date,ivl):
+        self.req_type = "greeks"
+        return self._get_bulk_hist(start_date,end_date,ivl)
+
     # At time endpoints
     def get_at_time_quote(self,start_date,end_date,s_of_day):
         self.req_type = "quote"
@@ -1,12 +1,29 @@
-from ._option import Option,OptionError
+from ._option import Option,OptionError,BulkEndpointError,BULK_UNAVAILABLE_STATUS
 from ..wrapper import NoDataForContract
-from ..utils import _format_date
+from ..utils import _format_date,_format_dates,_concat_columns
 from datetime import datetime, timedelta
-import pandas as pd
-from typing import Optional,List
+from typing import Optional,List,Union,Iterable,Tuple,Dict,Any
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 YESTERDAY = datetime.now() - timedelta(days=1)
 
+# Per-contract method -> bulk (expiration-wide) method with the same parameters
+BULK_METHODS = {
+    "get_hist_eod":"get_bulk_hist_eod"
+    ,"get_hist_open_interest":"get_bulk_hist_open_interest"
+    ,"get_hist_ohlc":"get_bulk_hist_ohlc"
+    ,"get_hist_quote":"get_bulk_hist_quote"
+    ,"get_hist_trade":"get_bulk_hist_trade"
+    ,"get_hist_greeks":"get_bulk_hist_greeks"
+}
+
+def _isBulkUnavailable(error: Exception) -> bool:
+    status = getattr(error, "status", getattr(error, "status_code", None))
+    return isinstance(error, BulkEndpointError) or status in BULK_UNAVAILABLE_STATUS
+
 class Option(Option):
     def __init__(self,*args,**kwargs):
         super().__init__(*args,**kwargs)
@@ -45,6 +62,8 @@ class Option(Option):
         ['20220304', '20220307', '20220308', '20220309', '20220310']
         """
         
+        import pandas as pd
+
         date_range = None
         if not isinstance(days_ago,int) :
             raise TypeError("[+] days_ago must be positive integer")
@@ -52,7 +71,7 @@ class Option(Option):
             raise ValueError("[+] days_ago must be positive integer")
             
 
-        args = {"root":self.root,"exp":self.exp}
+        args = {"root":self.root,"exp":self.exp,"session":self.session}
 
         if self.strike and self.right:
             args["strike"] = self.strike
@@ -75,11 +94,11 @@ class Option(Option):
             if len(date_implied_vol)>0:
                 date_implied_vol = [str(_dict.get("implied_volatility")) for _dict in date_implied_vol]
                 date_range = [date for date in date_range.strftime('%Y%m%d').to_list() if date in date_implied_vol]
-                print(f"[+] {len(date_range)} business days for {self.exp}")
+                logger.info("%s business days for %s", len(date_range), self.exp)
             return date_range
         
         except NoDataForContract:
-            print(f"[+] NO IMPLIED VOL DATA FOR {self.exp} - check with thetadata")
+            logger.warning("No implied vol data for %s - check with thetadata", self.exp)
             return None
         
     def get_desired_expirations(self, min_exp_date: str, max_exp_date: str, freq_exp: str = 'monthly') -> List[str]:
@@ -115,6 +134,8 @@ class Option(Option):
         """
 
 
+        import pandas as pd
+
         desired_expirations = None
         if not isinstance(freq_exp,str):
             raise TypeError("freq_exp must be a str")
@@ -143,7 +164,7 @@ class Option(Option):
             return desired_expirations
         
         except NoDataForContract:
-            print(f"[+] NO EXPIRATIONS FOR {self.__str__()} - check with thetadata")
+            logger.warning("No expirations for %s - check with thetadata", self.__str__())
             raise NoDataForContract
         
 
@@ -180,6 +201,8 @@ class Option(Option):
         """
 
         
+        import pandas as pd
+
         desired_strikes = None
         if not isinstance(strike_multiple,int):
             raise TypeError("[+] strike_multiple must be a positive integer")
@@ -198,5 +221,191 @@ class Option(Option):
             return desired_strikes
         
         except NoDataForContract:
-            print(f"[+] NO STRIKES FOR {self.__str__()} - check with thetadata")
+            logger.warning("No strikes for %s - check with thetadata", self.__str__())
             raise NoDataForContract
+
+    def _list_strikes(self, exp: str) -> List[float]:
+        """
+        Strikes of one expiration of the root, in dollars.
+        """
+        listing = Option(root=self.root, exp=_format_date(exp), session=self.session, cache=self.cache)
+        return [strike.get("strikes")/1000 for strike in listing.get_list_strikes()]
+
+    def _plan_chain(self, method: str, method_params: Dict[str, Any], exps: List[str], rights: Iterable[str]
+                    , strikes: Dict[str, Iterable[float]]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Plans one detached request per exp x strike x right, reusing a single Option to build and validate
+        the url/params of each contract.
+
+        Parameters:
+        -----------
+        exps : List[str]
+            Expirations, formatted as "YYYYMMDD".
+        strikes : Dict[str, Iterable[float]]
+            Strikes of each expiration of exps.
+
+        Returns:
+        --------
+        Tuple[List[MyWrapper], List[Dict[str, Any]]]
+            The requests to fetch and, for each of them, its root/exp/right/strike.
+        """
+        requests, keys = [], []
+        planner = Option(root=self.root, _async=True, session=self.session, cache=self.cache, typed=self.typed)
+        for exp in exps:
+            planner.exp = planner._exp = exp
+            for strike in strikes[exp]:
+                for right in rights:
+                    planner.strike, planner.right = strike, right
+                    planner._strike, planner._right = planner._format_strike(), planner._format_right()
+                    planner.url = None
+                    planner._get_method(method, method_params)
+                    if planner.url is None:
+                        raise OptionError(f"[+] Invalid request {method}{method_params} for {planner.__str__()}")
+
+                    requests.append(planner._to_request(output="numpy"))
+                    keys.append({"root": self.root, "exp": int(planner._exp), "right": planner._right, "strike": planner._strike})
+        return requests, keys
+
+    def _plan_bulk(self, method: str, method_params: Dict[str, Any], exp: str):
+        """
+        Plans the detached bulk request of one expiration.
+        """
+        planner = Option(root=self.root, exp=exp, _async=True, session=self.session, cache=self.cache, typed=self.typed)
+        planner._get_method(method, method_params)
+        return planner._to_request(output="numpy")
+
+    def _filter_bulk(self, columns: Dict[str, Any], rights: Iterable[str], strikes: Optional[Iterable[float]]):
+        """
+        Keeps the rows of a bulk result matching the requested rights and strikes.
+        """
+        import numpy as np
+
+        _rights = [Option(root=self.root, right=right)._format_right() for right in rights]
+        mask = np.isin(columns["right"], _rights)
+        if strikes is not None:
+            mask &= np.isin(columns["strike"], [int(round(strike*1000)) for strike in strikes])
+        return {key: column[mask] for key, column in columns.items()}
+
+    async def _afetch_bulk(self, method: str, method_params: Dict[str, Any], exps: List[str], rights: Iterable[str]
+                           , strikes: Optional[Iterable[float]], fetcher) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Fetches each expiration with the bulk endpoint.
+
+        Returns:
+        --------
+        Tuple[List[Dict], List[str]]
+            The columnar results and the expirations for which the bulk endpoint is unavailable.
+        """
+        requests = [self._plan_bulk(BULK_METHODS[method], method_params, exp) for exp in exps]
+        results = await fetcher.fetch_all_contracts(requests)
+
+        unavailable = {failure["index"] for failure in fetcher.failures if _isBulkUnavailable(failure["error"])}
+        fetcher.failures = [failure for failure in fetcher.failures if failure["index"] not in unavailable]
+
+        parts = []
+        for idx, result in enumerate(results):
+            if idx not in unavailable and result.get("data"):
+                parts.append(self._filter_bulk(result["data"], rights, strikes))
+        return parts, [exp for idx, exp in enumerate(exps) if idx in unavailable]
+
+    async def afetch_chain(self, method: str, start_date: str, end_date: str, ivl: Optional[int] = None
+                           , exps: Union[str, Iterable[str], None] = None, rights: Iterable[str] = ("C","P")
+                           , strikes: Optional[Iterable[float]] = None, fetcher=None, bulk: bool = True):
+        """
+        Coroutine version of `fetch_chain`, for callers already running an event loop.
+        """
+        from ..fetcher import AsyncFetcher
+
+        if exps is None:
+            if self.exp is None:
+                raise OptionError("[+] An expiration is required to fetch the chain")
+            exps = [self.exp]
+        elif isinstance(exps, (str, int)):
+            exps = [exps]
+
+        method_params = {"start_date": start_date, "end_date": end_date}
+        if ivl is not None:
+            method_params["ivl"] = ivl
+
+        if fetcher is None:
+            fetcher = AsyncFetcher(batch_size=32, timeout=60, max_retry=3, sleep=1)
+
+        # Request giving the sec_type/req_type of the rows, for their dtypes
+        typer = self
+        exps, chain, failures = _format_dates(exps), [], []
+        if bulk and method in BULK_METHODS and exps:
+            typer = self._plan_bulk(BULK_METHODS[method], method_params, exps[0])
+            logger.info("About to fetch %s expirations for %s with %s", len(exps), self.root, BULK_METHODS[method])
+            chain, exps = await self._afetch_bulk(method, method_params, exps, rights, strikes, fetcher)
+            failures = fetcher.failures
+            if exps:
+                logger.info("Bulk endpoint unavailable for %s - falling back to one request per contract", exps)
+
+        if exps:
+            if strikes is None:
+                # The listings are sync requests - sent from threads, so the event loop keeps running
+                listings = await asyncio.gather(*(asyncio.to_thread(self._list_strikes, exp) for exp in exps))
+                chain_strikes = dict(zip(exps, listings))
+            else:
+                strikes = list(strikes)
+                chain_strikes = {exp: strikes for exp in exps}
+            requests, keys = self._plan_chain(method, method_params, exps, rights, chain_strikes)
+            typer = requests[0] if requests else typer
+            logger.info("About to fetch %s contracts for %s", len(requests), self.root)
+            results = await fetcher.fetch_all_contracts(requests)
+            fetcher.failures = failures + fetcher.failures
+
+            parts, meta = [], []
+            for key, result in zip(keys, results):
+                if result.get("data"):
+                    parts.append(result["data"])
+                    meta.append(key)
+            chain.append(_concat_columns(parts, meta))
+
+        columns = _concat_columns([part for part in chain if part])
+        # Same frame as a single contract in "pandas" output - the codes of the schema become categoricals too
+        dtypes = {**typer._dtypes(list(columns)), "root": "category", "right": "category"}
+        return self._to_frame(columns, dtypes)
+
+    def fetch_chain(self, method: str, start_date: str, end_date: str, ivl: Optional[int] = None
+                    , exps: Union[str, Iterable[str], None] = None, rights: Iterable[str] = ("C","P")
+                    , strikes: Optional[Iterable[float]] = None, fetcher=None, bulk: bool = True):
+        """
+        Fetches a whole chain - every strike x right of one or several expirations - concurrently, and returns
+        it as a single table.
+
+        Parameters:
+        -----------
+        method : str
+            Historical method to call for each contract, e.g. "get_hist_eod", "get_hist_quote", "get_hist_open_interest".
+        start_date : str
+            Start of the range.
+        end_date : str
+            End of the range.
+        ivl : int, optional
+            Interval in seconds, for the methods that take one.
+        exps : str or Iterable[str], optional
+            Expiration(s) of the chain - defaults to the expiration of this Option.
+        rights : Iterable[str]
+            Rights to fetch - calls and puts by default.
+        strikes : Iterable[float], optional
+            Strikes to fetch - defaults to every strike listed for each expiration.
+        fetcher : AsyncFetcher, optional
+            Fetcher used to run the requests over one session - its `failures` list the requests that failed.
+        bulk : bool
+            Use the bulk (expiration-wide) endpoint of the method when there is one - one request per expiration
+            instead of one per contract. Falls back to one request per contract if the terminal doesn't serve it.
+
+        Returns:
+        --------
+        pd.DataFrame
+            One row per tick of every contract, with the fields of the endpoint plus root, exp, right and strike
+            (in 1/1000th of a dollar, as in the requests).
+
+        Example:
+        --------
+        >>> option = Option(root="AMD", exp="20230317")
+        >>> df = option.fetch_chain("get_hist_open_interest", "20230101", "20230201")
+        """
+        return asyncio.run(self.afetch_chain(method, start_date, end_date, ivl=ivl, exps=exps, rights=rights
+                                             , strikes=strikes, fetcher=fetcher, bulk=bulk))
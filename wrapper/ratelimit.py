@@ -0,0 +1,245 @@
+import asyncio
+import contextlib
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "thetadata-ratelimit")
+
+# State of the token bucket: tokens left, time of the last update
+_BUCKET = struct.Struct("=dd")
+
+def _lock(fd: int, blocking: bool = True) -> bool:
+    """
+    Exclusive lock on an open file, released by the OS if the process dies. Returns False if the lock
+    is held by someone else and blocking is False.
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.001)
+
+def _unlock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+class RateLimiter:
+    def __init__(self,rate: Optional[float] = None,burst: Optional[int] = None,max_in_flight: Optional[int] = None
+                 ,directory: str = DEFAULT_DIRECTORY,poll: float = 0.005):
+        """
+        Request budget of the terminal shared by every process of the machine using the same directory:
+        a token bucket of `rate` requests per second and `max_in_flight` concurrent requests.
+
+        The bucket lives in a small file updated under a file lock, and each in-flight slot is a lock on
+        its own file - the OS releases the slots of a process that dies, so a crashed worker never leaks
+        its slots. Every process sharing the directory should use the same rate and max_in_flight.
+
+        Parameters:
+        -----------
+        rate : float, optional
+            Requests per second, for all the processes together - None for no rate limit.
+        burst : int, optional
+            Requests that can be sent at once after an idle period - defaults to max(1, rate).
+        max_in_flight : int, optional
+            Concurrent requests, for all the processes together - None for no limit.
+        directory : str
+            Folder of the files shared by the processes.
+        poll : float
+            Initial wait between two attempts to get a slot, in seconds - up to 4 times more after that.
+
+        Example:
+        --------
+        >>> # in every worker of the host
+        >>> set_default_rate_limiter(RateLimiter(rate=50, max_in_flight=16))
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate)) if rate else None
+        self.max_in_flight = max_in_flight
+        self.directory = directory
+        self.poll = poll
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._bucket_fd = None
+        self._slot_fds = {}
+        self._held = set()
+
+    def __getstate__(self):
+        # Only the settings travel to another process - it opens its own files
+        return {"rate": self.rate, "burst": self.burst, "max_in_flight": self.max_in_flight
+                , "directory": self.directory, "poll": self.poll}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _open(self):
+        # Locks belong to the open file - a forked child must not share the descriptors of its parent
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._bucket_fd = None
+            self._slot_fds = {}
+            self._held = set()
+        if self._bucket_fd is None and self.rate:
+            self._bucket_fd = os.open(os.path.join(self.directory, "bucket"), os.O_RDWR | os.O_CREAT)
+
+    def _slot_fd(self, slot: int) -> int:
+        fd = self._slot_fds.get(slot)
+        if fd is None:
+            fd = self._slot_fds[slot] = os.open(os.path.join(self.directory, f"slot-{slot}"), os.O_RDWR | os.O_CREAT)
+        return fd
+
+    def _take_token(self) -> float:
+        """
+        Reserves the next token of the bucket, even if it is not there yet.
+
+        Returns:
+            float: Seconds to wait before the token is there.
+        """
+        with self._lock:
+            self._open()
+            fd = self._bucket_fd
+            _lock(fd)
+            try:
+                now = time.time()
+                os.lseek(fd, 0, os.SEEK_SET)
+                state = os.read(fd, _BUCKET.size)
+                tokens, stamp = _BUCKET.unpack(state) if len(state) == _BUCKET.size else (float(self.burst), now)
+                tokens = min(float(self.burst), tokens + (now - stamp)*self.rate) - 1
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, _BUCKET.pack(tokens, now))
+            finally:
+                _unlock(fd)
+        return max(0.0, -tokens/self.rate)
+
+    def _try_slot(self) -> Optional[int]:
+        with self._lock:
+            self._open()
+            start = random.randrange(self.max_in_flight)
+            for idx in range(self.max_in_flight):
+                slot = (start + idx) % self.max_in_flight
+                if slot not in self._held and _lock(self._slot_fd(slot), blocking=False):
+                    self._held.add(slot)
+                    return slot
+        return None
+
+    def _poll_delays(self):
+        # Jittered, so the waiting processes don't retry in lockstep
+        delay = self.poll
+        while True:
+            yield random.uniform(delay/2, delay)
+            delay = min(delay*2, 4*self.poll)
+
+    def acquire(self) -> Optional[int]:
+        """
+        Blocks until a slot is free and a token is available.
+
+        Returns:
+            The slot to give back to release.
+        """
+        slot = None
+        if self.max_in_flight:
+            delays = self._poll_delays()
+            while (slot := self._try_slot()) is None:
+                time.sleep(next(delays))
+        if self.rate:
+            try:
+                time.sleep(self._take_token())
+            except BaseException:
+                self.release(slot)
+                raise
+        return slot
+
+    async def aacquire(self) -> Optional[int]:
+        """
+        Coroutine version of acquire - waits without blocking the event loop.
+        """
+        slot = None
+        if self.max_in_flight:
+            delays = self._poll_delays()
+            while (slot := self._try_slot()) is None:
+                await asyncio.sleep(next(delays))
+        if self.rate:
+            try:
+                await asyncio.sleep(self._take_token())
+            except BaseException:
+                self.release(slot)
+                raise
+        return slot
+
+    def release(self, slot: Optional[int]):
+        if slot is None:
+            return
+        with self._lock:
+            if slot in self._held and self._pid == os.getpid():
+                _unlock(self._slot_fds[slot])
+            self._held.discard(slot)
+
+    @contextlib.contextmanager
+    def limit(self):
+        """
+        >>> with limiter.limit():
+        ...     response = session.get(url)
+        """
+        slot = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+    @contextlib.asynccontextmanager
+    async def alimit(self):
+        slot = await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                for fd in ([self._bucket_fd] if self._bucket_fd is not None else []) + list(self._slot_fds.values()):
+                    os.close(fd)
+            self._pid = None
+            self._bucket_fd = None
+            self._slot_fds = {}
+            self._held = set()
+
+_default_rate_limiter = None
+
+def get_default_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Returns the process-wide rate limiter respected by the sync requests and the AsyncFetcher, if any.
+    """
+    return _default_rate_limiter
+
+def set_default_rate_limiter(limiter: Optional[RateLimiter]):
+    """
+    Sets the process-wide rate limiter - None to remove it.
+    """
+    global _default_rate_limiter
+    _default_rate_limiter = limiter
@@ -0,0 +1,156 @@
+from typing import Dict,List,Optional,Any
+
+# Compact dtype of the fields returned by the terminal, whatever the req_type.
+# "category" fields are small integer codes: int16 in "numpy" output, pandas categoricals in "pandas" output.
+FIELD_DTYPES = {
+    # time
+    "ms_of_day":"int32"
+    ,"ms_of_day2":"int32"
+    ,"date":"int32"
+    # sizes and counts
+    ,"bid_size":"int32"
+    ,"ask_size":"int32"
+    ,"size":"int32"
+    ,"count":"int32"
+    ,"open_interest":"int32"
+    ,"records_back":"int32"
+    ,"volume":"int64"
+    ,"sequence":"int64"
+    # codes
+    ,"bid_exchange":"uint8"
+    ,"ask_exchange":"uint8"
+    ,"exchange":"uint8"
+    ,"condition_flags":"uint8"
+    ,"price_flags":"uint8"
+    ,"volume_type":"uint8"
+    ,"bid_condition":"category"
+    ,"ask_condition":"category"
+    ,"condition":"category"
+    ,"ext_condition1":"category"
+    ,"ext_condition2":"category"
+    ,"ext_condition3":"category"
+    ,"ext_condition4":"category"
+    # prices
+    ,"bid":"float32"
+    ,"ask":"float32"
+    ,"midpoint":"float32"
+    ,"price":"float32"
+    ,"open":"float32"
+    ,"high":"float32"
+    ,"low":"float32"
+    ,"close":"float32"
+    ,"underlying_price":"float32"
+    # volatility and greeks
+    ,"implied_vol":"float32"
+    ,"bid_implied_vol":"float32"
+    ,"ask_implied_vol":"float32"
+    ,"iv_error":"float32"
+    ,"delta":"float32"
+    ,"theta":"float32"
+    ,"vega":"float32"
+    ,"rho":"float32"
+    ,"epsilon":"float32"
+    ,"lambda":"float32"
+    ,"gamma":"float32"
+    ,"vanna":"float32"
+    ,"charm":"float32"
+    ,"vomma":"float32"
+    ,"veta":"float32"
+    ,"vera":"float32"
+    ,"speed":"float32"
+    ,"zomma":"float32"
+    ,"color":"float32"
+    ,"ultima":"float32"
+    ,"d1":"float32"
+    ,"d2":"float32"
+    ,"dual_delta":"float32"
+    ,"dual_gamma":"float32"
+    # list endpoints and contract columns
+    ,"strikes":"int32"
+    ,"strike":"int32"
+    ,"exp":"int32"
+    ,"expirations":"int32"
+}
+
+def _fields(*fields: str) -> Dict[str, str]:
+    return {field: FIELD_DTYPES[field] for field in fields}
+
+_QUOTE = ("ms_of_day","bid_size","bid_exchange","bid","bid_condition","ask_size","ask_exchange","ask","ask_condition","date")
+_TRADE = ("ms_of_day","sequence","ext_condition1","ext_condition2","ext_condition3","ext_condition4","condition","size"
+          ,"exchange","price","condition_flags","price_flags","volume_type","records_back","date")
+_OHLC = ("ms_of_day","open","high","low","close","volume","count","date")
+_EOD = ("ms_of_day","ms_of_day2","open","high","low","close","volume","count","bid_size","bid_exchange","bid","bid_condition"
+        ,"ask_size","ask_exchange","ask","ask_condition","date")
+
+# (sec_type, req_type) -> {field: dtype}
+SCHEMAS = {
+    ("option","quote"):_fields(*_QUOTE)
+    ,("option","trade"):_fields(*_TRADE)
+    ,("option","ohlc"):_fields(*_OHLC)
+    ,("option","eod"):_fields(*_EOD)
+    ,("option","open_interest"):_fields("ms_of_day","open_interest","date")
+    ,("option","implied_volatility"):_fields("ms_of_day","bid","bid_implied_vol","midpoint","implied_vol","ask","ask_implied_vol"
+                                             ,"iv_error","ms_of_day2","underlying_price","date")
+    ,("option","greeks"):_fields("ms_of_day","bid","ask","delta","theta","vega","rho","epsilon","lambda","implied_vol"
+                                 ,"iv_error","ms_of_day2","underlying_price","date")
+    ,("option","greeks_second_order"):_fields("ms_of_day","bid","ask","gamma","vanna","charm","vomma","veta","implied_vol"
+                                              ,"iv_error","ms_of_day2","underlying_price","date")
+    ,("option","greeks_third_order"):_fields("ms_of_day","bid","ask","speed","zomma","color","ultima","implied_vol"
+                                             ,"iv_error","ms_of_day2","underlying_price","date")
+    ,("stock","quote"):_fields(*_QUOTE)
+    ,("stock","trade"):_fields(*_TRADE)
+    ,("stock","ohlc"):_fields(*_OHLC)
+    ,("stock","eod"):_fields(*_EOD)
+}
+
+def register_schema(sec_type: str, req_type: str, dtypes: Dict[str, str]):
+    """
+    Registers (or overrides) the dtypes of the fields of a req_type, e.g. to keep float64 prices:
+    register_schema("option", "quote", {"bid": "float64", "ask": "float64"}).
+
+    Args:
+        sec_type (str): "option" or "stock".
+        req_type (str): The req_type of the endpoint.
+        dtypes (Dict[str, str]): NumPy dtype names, or "category", per field.
+    """
+    SCHEMAS.setdefault((sec_type, req_type), {}).update(dtypes)
+
+def get_dtypes(sec_type: Optional[str], req_type: Optional[str], fields: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Returns the dtype of each field of a response - from the schema of (sec_type, req_type), then from
+    FIELD_DTYPES. Unknown fields get None, i.e. the dtype NumPy infers.
+    """
+    schema = SCHEMAS.get((sec_type, req_type), {})
+    return {field: schema.get(field, FIELD_DTYPES.get(field)) for field in fields}
+
+def _to_array(values: Any, dtype: Optional[str]):
+    """
+    Builds the array of a field with its compact dtype, falling back on the inferred dtype if the values
+    don't fit it (e.g. a code above 255 in a uint8 field, or prices in an integer field).
+    """
+    import numpy as np
+
+    array = np.asarray(values)
+    if dtype is None:
+        return array
+    try:
+        with np.errstate(invalid="ignore"):
+            cast = array.astype("int16" if dtype == "category" else dtype, copy=False)
+    except (OverflowError, ValueError, TypeError):
+        return array
+    # Casting to an integer dtype wraps out of range values and truncates floats without a word
+    if cast.dtype.kind in "iu" and not np.array_equal(cast, array):
+        return array
+    return cast
+
+def _to_frame(columns: Dict[str, Any], dtypes: Dict[str, Optional[str]]):
+    """
+    DataFrame of typed columns - "category" fields become pandas categoricals.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(columns, copy=False)
+    for field, dtype in dtypes.items():
+        if dtype == "category" and field in df:
+            df[field] = df[field].astype("category")
+    return df
@@ -0,0 +1,100 @@
+from typing import Optional,Union,Tuple,TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests as rq
+    from .ratelimit import RateLimiter
+
+DEFAULT_BASE_URL = "http://localhost:25510"
+
+class ThetaSession:
+    def __init__(self,base_url: str = DEFAULT_BASE_URL,pool_size: int = 10,max_retries: int = 3
+                 ,backoff_factor: float = 0.5,timeout: Optional[Union[float, Tuple[float, float]]] = None
+                 ,rate_limiter: Optional["RateLimiter"] = None):
+        """
+        Pooled keep-alive HTTP session to the Theta Terminal, shared by the sync Option/Stock calls.
+
+        Parameters:
+        -----------
+        base_url : str
+            Url of the Theta Terminal.
+        pool_size : int
+            Number of connections kept alive to the terminal.
+        max_retries : int
+            Number of retries on connection errors and 5xx responses.
+        backoff_factor : float
+            Backoff factor between retries (see urllib3 Retry).
+        timeout : float or (connect, read) tuple, optional
+            Timeout applied to every request - None waits forever.
+        rate_limiter : RateLimiter, optional
+            Request budget respected by the wrappers using this session - defaults to the process-wide
+            rate limiter, if any.
+
+        Example:
+        --------
+        >>> with ThetaSession(pool_size=4) as session:
+        ...     option = Option(root="AAPL", exp="20230317", session=session)
+        ...     strikes = option.get_list_strikes()
+        """
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.closed = False
+
+        # requests is only imported once a session is needed, to keep `import wrapper` cheap
+        import requests as rq
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=max_retries
+            ,backoff_factor=backoff_factor
+            ,status_forcelist=(500,502,503,504)
+            ,allowed_methods=frozenset(["GET"])
+            ,raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size,pool_maxsize=pool_size,max_retries=retry)
+        self._session = rq.Session()
+        self._session.mount("http://",adapter)
+        self._session.mount("https://",adapter)
+
+    def get(self,url: str,params=None) -> "rq.Response":
+        if self.closed:
+            raise RuntimeError("ThetaSession is closed")
+        return self._session.get(url,params=params,timeout=self.timeout)
+
+    def close(self):
+        if not self.closed:
+            self._session.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.close()
+
+_default_session = None
+
+def get_default_session() -> ThetaSession:
+    """
+    Returns the process-wide session used by the wrappers created without a session,
+    creating it on first use (or again if it has been closed).
+    """
+    global _default_session
+    if _default_session is None or _default_session.closed:
+        _default_session = ThetaSession()
+    return _default_session
+
+def set_default_session(session: Optional[ThetaSession]):
+    """
+    Replaces the process-wide session, e.g. to point every wrapper to another terminal - the wrappers
+    created without a session, before or after, use it from their next request. The previous default
+    session is closed.
+    """
+    global _default_session
+    if _default_session is not None and _default_session is not session:
+        _default_session.close()
+    _default_session = session
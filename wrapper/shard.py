@@ -0,0 +1,141 @@
+import asyncio
+import copy
+import datetime as dt
+from typing import List,Tuple,Optional,Any
+
+from .utils import _format_date,_format_ivl,_isDateRangeValid,_concat_columns,_set_timestamp_index
+from .wrapper import NoDataForContract
+
+def _shard_days(ivl: Optional[int]) -> int:
+    """
+    Number of calendar days per shard for an interval in seconds - a day of ticks or sub-minute bars,
+    a week of minute bars, a month of anything coarser.
+    """
+    if ivl is None:
+        return 31
+    _ivl = _format_ivl(ivl)
+    if _ivl < 60_000:
+        return 1
+    if _ivl < 900_000:
+        return 7
+    return 31
+
+def _shard_date_range(start_date: str, end_date: str, shard_days: int) -> List[Tuple[str, str]]:
+    """
+    Splits [start_date, end_date] into consecutive, non-overlapping ranges of `shard_days` calendar days.
+
+    Returns:
+        List[Tuple[str, str]]: (start_date, end_date) of each shard, as "YYYYMMDD", in order.
+    """
+    if shard_days < 1:
+        raise ValueError("shard_days must be a positive integer")
+
+    _start = dt.datetime.strptime(_format_date(start_date), "%Y%m%d").date()
+    _end = dt.datetime.strptime(_format_date(end_date), "%Y%m%d").date()
+    shards = []
+    while _start <= _end:
+        _stop = min(_end, _start + dt.timedelta(days=shard_days-1))
+        shards.append((_start.strftime("%Y%m%d"), _stop.strftime("%Y%m%d")))
+        _start = _stop + dt.timedelta(days=1)
+    return shards
+
+def _clip_shard(data: Any, start_date: str, end_date: str, output: str) -> Any:
+    """
+    Drops the rows of a shard dated outside of its range, so shards never overlap once merged.
+    """
+    lo, hi = int(start_date), int(end_date)
+    if output == "records":
+        return [row for row in data if "date" not in row or lo <= int(row["date"]) <= hi]
+    if "date" not in data:
+        return data
+    mask = (data["date"] >= lo) & (data["date"] <= hi)
+    return {key: column[mask] for key, column in data.items()}
+
+async def afetch_sharded(contract, method: str, start_date: str, end_date: str, ivl: Optional[int] = None
+                         , shard_days: Optional[int] = None, fetcher=None):
+    """
+    Coroutine version of `fetch_sharded`, for callers already running an event loop.
+    """
+    from .fetcher import AsyncFetcher
+
+    _start_date, _end_date = _format_date(start_date), _format_date(end_date)
+    _isDateRangeValid(_start_date, _end_date)
+    shards = _shard_date_range(_start_date, _end_date, shard_days or _shard_days(ivl))
+
+    # A shallow copy in async mode plans the requests without touching the state of the contract
+    planner = copy.copy(contract)
+    planner._async = True
+    output = "records" if contract.output == "records" else "numpy"
+    requests = []
+    for shard_start, shard_end in shards:
+        params = {"start_date": shard_start, "end_date": shard_end}
+        if ivl is not None:
+            params["ivl"] = ivl
+        planner.url = None
+        getattr(planner, method)(**params)
+        if planner.url is None:
+            raise ValueError(f"[+] Invalid request {method}{params} for {contract.__str__()}")
+        requests.append(planner._to_request(output=output))
+
+    if fetcher is None:
+        fetcher = AsyncFetcher(batch_size=8, timeout=60, max_retry=3, sleep=1)
+    results = await fetcher.fetch_all_contracts(requests)
+    if fetcher.failures:
+        failure = fetcher.failures[0]
+        raise failure["error"]
+
+    parts = [_clip_shard(result["data"], *shard, output) for shard, result in zip(shards, results) if result.get("data")]
+    if not parts:
+        raise NoDataForContract(f"[+] No data for {contract.__str__()} between {_start_date} and {_end_date}")
+
+    if output == "records":
+        return [row for part in parts for row in part]
+    columns = _concat_columns(parts)
+    if contract.output == "pandas":
+        import pandas as pd
+        df = pd.DataFrame(columns, copy=False)
+        return _set_timestamp_index(df) if contract.timestamps else df
+    return columns
+
+def fetch_sharded(contract, method: str, start_date: str, end_date: str, ivl: Optional[int] = None
+                  , shard_days: Optional[int] = None, fetcher=None):
+    """
+    Fetches a long historical range of one contract as several smaller requests run in parallel, then merges
+    them back in date order - each shard is cheap to retry and stays below the terminal timeouts.
+
+    Parameters:
+    -----------
+    contract : Option or Stock
+        The contract to fetch - its output mode is kept.
+    method : str
+        Historical method of the contract, e.g. "get_hist_quote".
+    start_date : str
+        Start of the range.
+    end_date : str
+        End of the range.
+    ivl : int, optional
+        Interval in seconds, for the methods that take one. Also sizes the shards: a day under a minute, a week
+        under 15 minutes, a month above.
+    shard_days : int, optional
+        Calendar days per shard - overrides the size picked from `ivl`.
+    fetcher : AsyncFetcher, optional
+        Fetcher used to run the shards.
+
+    Returns:
+    --------
+    The merged data, in the output mode of the contract.
+
+    Raises:
+    -------
+    NoDataForContract:
+        If no shard has data.
+    Exception:
+        The error of the first shard that could not be fetched.
+
+    Example:
+    --------
+    >>> option = Option("SPY", "20231215", "C", 450)
+    >>> quotes = option.fetch_sharded("get_hist_quote", "20230101", "20231215", ivl=1)
+    """
+    return asyncio.run(afetch_sharded(contract, method, start_date, end_date, ivl=ivl, shard_days=shard_days
+                                      , fetcher=fetcher))
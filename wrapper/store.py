@@ -0,0 +1,367 @@
+import os
+import uuid
+from typing import Set,Optional,Iterable,Dict,Any,List
+
+def _store_key(contract, req_type: str) -> str:
+    """
+    Name of the data of a contract for a req_type in a local store, e.g. "option_SPY_20231215_C_450000_quote"
+    or "stock_SPY_trade".
+    """
+    parts = [
+        contract.sec_type
+        ,getattr(contract, "root", None)
+        ,getattr(contract, "_exp", None)
+        ,getattr(contract, "_right", None)
+        ,getattr(contract, "_strike", None)
+        ,req_type
+    ]
+    return "_".join(str(part) for part in parts if part is not None)
+
+class CsvStore:
+    def __init__(self,directory: str):
+        """
+        Local store keeping one CSV per contract and req_type, appended to by the updater.
+
+        Parameters:
+        -----------
+        directory : str
+            Folder of the CSV files.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self,contract,req_type: str) -> str:
+        return os.path.join(self.directory, f"{_store_key(contract, req_type)}.csv")
+
+    def dates(self,contract,req_type: str) -> Set[int]:
+        """
+        Returns the dates (YYYYMMDD integers) already stored for a contract and req_type.
+        """
+        import pandas as pd
+
+        path = self._path(contract, req_type)
+        if not os.path.exists(path):
+            return set()
+        return set(pd.read_csv(path, usecols=["date"])["date"].astype(int))
+
+    def append(self,contract,req_type: str,df):
+        """
+        Appends rows to the data of a contract and req_type.
+        """
+        path = self._path(contract, req_type)
+        df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+    def drop_dates(self,contract,req_type: str,dates: Iterable[int]):
+        """
+        Removes the rows of the given dates (YYYYMMDD integers) from the data of a contract and req_type.
+        """
+        import pandas as pd
+
+        path = self._path(contract, req_type)
+        if not os.path.exists(path):
+            return
+        df = pd.read_csv(path)
+        df[~df["date"].astype(int).isin([int(date) for date in dates])].to_csv(path, index=False)
+
+    def read(self,contract,req_type: str):
+        import pandas as pd
+        return pd.read_csv(self._path(contract, req_type))
+
+# Partition columns of each sec_type, in folder order
+PARTITIONS = {
+    "option": ["root","req_type","exp","right"]
+    ,"stock": ["root","req_type"]
+}
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("ParquetStore requires pyarrow - pip install pyarrow") from e
+    return pyarrow
+
+def _dataset_dtype(key: str, column) -> Optional[str]:
+    """
+    Dtype of a column in the dataset - the same for every file, whatever the values of a file: the dtype of the
+    schema registry ("category" fields as their int16 codes), else int64/float64 for the numbers.
+    """
+    from .schema import FIELD_DTYPES
+
+    dtype = FIELD_DTYPES.get(key)
+    if dtype == "category":
+        return "int16"
+    if dtype is not None:
+        return dtype
+    if column.dtype.kind in "iub":
+        return "int64" if column.dtype.kind != "b" else None
+    if column.dtype.kind == "f":
+        return "float64"
+    return None
+
+def _unify(columns: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Casts the columns to their dataset dtype (see _dataset_dtype).
+
+    Raises:
+        ValueError: If integer values don't fit the dtype of their field.
+    """
+    import numpy as np
+
+    unified = {}
+    for key, column in columns.items():
+        column = np.asarray(column)
+        dtype = _dataset_dtype(key, column)
+        if dtype is not None and column.dtype != dtype:
+            cast = column.astype(dtype)
+            if cast.dtype.kind in "iu" and not np.array_equal(cast, column):
+                raise ValueError(f"Values of {key} don't fit its dtype {dtype}")
+            column = cast
+        unified[key] = column
+    return unified
+
+def _to_columns(data) -> Dict[str, Any]:
+    """
+    Columns of the rows returned by the wrapper in any output mode.
+    """
+    import pandas as pd
+
+    if isinstance(data, pd.DataFrame):
+        return {key: data[key].to_numpy() for key in data.columns}
+    if isinstance(data, dict):
+        return dict(data)
+    columns = pd.DataFrame(data).to_dict("series")
+    return {key: column.to_numpy() for key, column in columns.items()}
+
+class ParquetStore:
+    def __init__(self,directory: str,row_group_size: int = 256*1024):
+        """
+        Parquet dataset partitioned by root/req_type/exp/right (root/req_type for stocks), with the compact dtypes
+        of the schema registry - the same in every file, so the files of a partition always read together.
+        Rows are sorted by strike, date and ms_of_day in each file so the readers can skip row groups from
+        their statistics.
+
+        Parameters:
+        -----------
+        directory : str
+            Root folder of the dataset - one sub folder per sec_type.
+        row_group_size : int
+            Maximum number of rows per row group.
+
+        Example:
+        --------
+        >>> store = ParquetStore("./data")
+        >>> async for idx, result in fetcher.stream(options):
+        ...     store.write_result(result)
+        >>> df = store.read("SPY", "greeks", start_date="20230301", end_date="20230331", rights=["C"])
+        """
+        _import_pyarrow()
+        self.directory = directory
+        self.row_group_size = row_group_size
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self,data,root: str,req_type: str,exp: Optional[str] = None,right: Optional[str] = None
+              ,strike: Optional[int] = None,sec_type: str = "option") -> Optional[str]:
+        """
+        Writes the rows of one contract as a new file of its partition.
+
+        Parameters:
+        -----------
+        data : DataFrame, dict of arrays or list of dicts
+            Rows of the contract, as returned by the wrapper in any output mode.
+        root, req_type, exp, right : str
+            Partition of the rows (exp and right only for options).
+        strike : int, optional
+            Strike of the contract, in 1/1000th of a dollar - stored as a column.
+
+        Returns:
+        --------
+        str
+            Path of the written file, or None if there were no rows.
+        """
+        pa = _import_pyarrow()
+
+        columns = _to_columns(data)
+        if not columns or not len(next(iter(columns.values()))):
+            return None
+
+        partition = {"root": root, "req_type": req_type, "exp": exp, "right": right}
+        # The partition values live in the folder names, not in the rows
+        for key in PARTITIONS[sec_type]:
+            columns.pop(key, None)
+        if strike is not None:
+            columns["strike"] = [int(strike)] * len(next(iter(columns.values())))
+
+        table = pa.table(_unify(columns))
+        sort_keys = [(key, "ascending") for key in ("strike","date","ms_of_day") if key in table.column_names]
+        if sort_keys:
+            table = table.sort_by(sort_keys)
+
+        folder = os.path.join(self.directory, sec_type, *[f"{key}={partition[key]}" for key in PARTITIONS[sec_type]])
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{uuid.uuid4().hex}.parquet")
+        pa.parquet.write_table(table, path, row_group_size=self.row_group_size, compression="zstd")
+        return path
+
+    def write_result(self,result: Dict[str, Any]) -> List[str]:
+        """
+        Writes a result of the AsyncFetcher (fetch_all_contracts or stream), using its url and params
+        for the partition. A bulk result (several contracts, with right and strike columns) is split into
+        one file per exp/right.
+
+        Returns:
+        --------
+        List[str]
+            Paths of the written files.
+        """
+        if result.get("data") is None or result.get("url") is None:
+            return []
+        params = result["params"]
+        sec_type, req_type = result["url"].rstrip("/").split("/")[-2:]
+        partition = {"root": params.get("root"), "req_type": req_type, "sec_type": sec_type}
+        if sec_type != "option" or "right" in params:
+            path = self.write(result["data"], exp=params.get("exp"), right=params.get("right")
+                              , strike=params.get("strike"), **partition)
+            return [path] if path is not None else []
+
+        import numpy as np
+
+        columns = _to_columns(result["data"])
+        if "right" not in columns:
+            raise ValueError(f"[+] Can't tell the right of the rows of {result['url']} {params}")
+        exps = columns["exp"] if "exp" in columns else np.full(len(columns["right"]), params.get("exp"))
+        paths = []
+        for exp, right in sorted(set(zip(exps.tolist(), columns["right"].tolist()))):
+            mask = (exps == exp) & (columns["right"] == right)
+            path = self.write({key: column[mask] for key, column in columns.items()}, exp=str(exp), right=right, **partition)
+            if path is not None:
+                paths.append(path)
+        return paths
+
+    def _filter(self,root: str,req_type: str,sec_type: str = "option",exps: Optional[Iterable] = None
+                ,rights: Optional[Iterable[str]] = None,strikes: Optional[Iterable[float]] = None
+                ,start_date: Optional[str] = None,end_date: Optional[str] = None):
+        import pyarrow.dataset as ds
+        from .utils import _format_date
+
+        expr = (ds.field("root") == root) & (ds.field("req_type") == req_type)
+        if exps is not None:
+            expr &= ds.field("exp").isin([int(_format_date(exp)) for exp in exps])
+        if rights is not None:
+            expr &= ds.field("right").isin([right[0].upper() for right in rights])
+        if strikes is not None:
+            expr &= ds.field("strike").isin([int(round(strike*1000)) for strike in strikes])
+        if start_date is not None:
+            expr &= ds.field("date") >= int(_format_date(start_date))
+        if end_date is not None:
+            expr &= ds.field("date") <= int(_format_date(end_date))
+        return expr
+
+    def _dataset(self,sec_type: str):
+        import pyarrow.dataset as ds
+
+        path = os.path.join(self.directory, sec_type)
+        if not os.path.exists(path):
+            return None
+        return ds.dataset(path, format="parquet", partitioning="hive")
+
+    def read(self,root: str,req_type: str,sec_type: str = "option",exps: Optional[Iterable] = None
+             ,rights: Optional[Iterable[str]] = None,strikes: Optional[Iterable[float]] = None
+             ,start_date: Optional[str] = None,end_date: Optional[str] = None,columns: Optional[List[str]] = None):
+        """
+        Reads the rows matching the filters. Partitions (root, req_type, exp, right) not matching are never opened,
+        and row groups are skipped from their strike/date statistics.
+
+        Parameters:
+        -----------
+        root, req_type : str
+            Partition to read.
+        exps : Iterable, optional
+            Expirations to keep.
+        rights : Iterable[str], optional
+            Rights to keep - "C" and/or "P".
+        strikes : Iterable[float], optional
+            Strikes to keep, in dollars.
+        start_date, end_date : str, optional
+            Dates to keep, inclusive.
+        columns : List[str], optional
+            Columns to read - all by default.
+
+        Returns:
+        --------
+        pd.DataFrame
+        """
+        import pandas as pd
+
+        dataset = self._dataset(sec_type)
+        if dataset is None:
+            return pd.DataFrame()
+        expr = self._filter(root, req_type, sec_type, exps, rights, strikes, start_date, end_date)
+        return dataset.to_table(filter=expr, columns=columns).to_pandas()
+
+    # Store interface of the updater
+    def dates(self,contract,req_type: str) -> Set[int]:
+        dataset = self._dataset(contract.sec_type)
+        if dataset is None:
+            return set()
+        exp = getattr(contract, "_exp", None)
+        right = getattr(contract, "_right", None)
+        strike = getattr(contract, "_strike", None)
+        expr = self._filter(
+            contract.root, req_type, contract.sec_type
+            ,exps=[exp] if exp else None
+            ,rights=[right] if right else None
+            ,strikes=[strike/1000] if strike is not None else None
+        )
+        table = dataset.to_table(filter=expr, columns=["date"])
+        return set(table.column("date").to_pylist())
+
+    def append(self,contract,req_type: str,df):
+        self.write(
+            df
+            ,root=contract.root
+            ,req_type=req_type
+            ,exp=getattr(contract, "_exp", None)
+            ,right=getattr(contract, "_right", None)
+            ,strike=getattr(contract, "_strike", None)
+            ,sec_type=contract.sec_type
+        )
+
+    def drop_dates(self,contract,req_type: str,dates: Iterable[int]):
+        """
+        Removes the rows of the given dates (YYYYMMDD integers) of a contract, rewriting the files of its
+        partition that hold some.
+        """
+        pa = _import_pyarrow()
+        import pyarrow.compute as pc
+
+        partition = {
+            "root": contract.root
+            ,"req_type": req_type
+            ,"exp": getattr(contract, "_exp", None)
+            ,"right": getattr(contract, "_right", None)
+        }
+        folder = os.path.join(self.directory, contract.sec_type, *[f"{key}={partition[key]}" for key in PARTITIONS[contract.sec_type]])
+        if not os.path.isdir(folder):
+            return
+        strike = getattr(contract, "_strike", None)
+        dates = [int(date) for date in dates]
+        for name in os.listdir(folder):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(folder, name)
+            table = pa.parquet.read_table(path)
+            mask = pc.is_in(table.column("date"), value_set=pa.array(dates, table.schema.field("date").type))
+            if strike is not None and "strike" in table.column_names:
+                mask = pc.and_(mask, pc.equal(table.column("strike"), int(strike)))
+            if not pc.any(mask).as_py():
+                continue
+            kept = table.filter(pc.invert(mask))
+            if kept.num_rows:
+                # Hidden until renamed, so the readers of the dataset never see it
+                tmp_path = os.path.join(folder, f".{name}.tmp")
+                pa.parquet.write_table(kept, tmp_path, row_group_size=self.row_group_size, compression="zstd")
+                os.replace(tmp_path, path)
+            else:
+                os.remove(path)
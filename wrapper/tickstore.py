@@ -0,0 +1,225 @@
+import json
+import os
+from typing import Dict,Any,List,Iterable,Optional
+
+# date*_DAY + ms_of_day sorts like the ticks and fits an int64 (ms_of_day < 86_400_000)
+_DAY = 100_000_000
+_TS = "_ts"
+
+def _tick_key(sec_type: str, req_type: str, params: Dict[str, Any]) -> str:
+    """
+    Name of a contract in the store from the params of its request, e.g. "option_SPY_20231215_C_450000_quote".
+    """
+    parts = [sec_type, params.get("root"), params.get("exp"), params.get("right"), params.get("strike"), req_type]
+    return "_".join(str(part) for part in parts if part is not None)
+
+# Columns telling the contract of each row of a bulk result
+_CONTRACT_FIELDS = ("root","exp","right","strike")
+
+def _split_contracts(params: Dict[str, Any], columns: Dict[str, Any]):
+    """
+    Yields (params, columns) for each contract of a result - the rows of a bulk result are grouped by their
+    root/exp/right/strike columns (dropped, as they are in the key), in whatever order the contracts come.
+    """
+    import numpy as np
+
+    fields = [field for field in _CONTRACT_FIELDS if field in columns]
+    if "right" not in fields or "strike" not in fields:
+        yield params, columns
+        return
+
+    n = len(columns["right"])
+    if n == 0:
+        return
+    # Stable, so the rows of each contract keep their order
+    keys = [np.asarray(columns[field]) for field in fields]
+    order = np.lexsort(keys[::-1])
+    keys = [key[order] for key in keys]
+    change = np.zeros(n, dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(change).tolist()
+    data = {name: np.asarray(column)[order] for name, column in columns.items() if name not in fields}
+    for start, stop in zip(starts, starts[1:] + [n]):
+        contract = {**params, **{field: key[start].item() for field, key in zip(fields, keys)}}
+        yield contract, {name: column[start:stop] for name, column in data.items()}
+
+class TickStore:
+    def __init__(self,directory: str):
+        """
+        Append-only columnar tick store - one raw file per column per contract, read back through NumPy memmaps.
+
+        Each contract keeps a sorted time index (date, ms_of_day), so a time window is two binary searches and
+        comes back as zero-copy views on the page cache.
+
+        Parameters:
+        -----------
+        directory : str
+            Root folder of the store - one sub folder per contract.
+
+        Example:
+        --------
+        >>> store = TickStore("./ticks")
+        >>> store.fill_from(await fetcher.fetch_all_contracts(options)) # options in "numpy" output
+        >>> window = store.slice("option_SPY_20231215_C_450000_quote", 20231101, start_ms=34_200_000, end_ms=36_000_000)
+        >>> window["bid"] # np.memmap view
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._maps = {}
+
+    def _folder(self,key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _meta(self,key: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._folder(key), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_meta(self,key: str,meta: Dict[str, Any]):
+        path = os.path.join(self._folder(key), "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def keys(self) -> List[str]:
+        return sorted(key for key in os.listdir(self.directory) if self._meta(key) is not None)
+
+    def __len__(self):
+        return len(self.keys())
+
+    def rows(self,key: str) -> int:
+        meta = self._meta(key)
+        return meta["rows"] if meta else 0
+
+    def _columns(self,key: str) -> Dict[str, Any]:
+        """
+        Memmaps of every column of a contract - cached until the next append.
+        """
+        import numpy as np
+
+        meta = self._meta(key)
+        if meta is None:
+            raise KeyError(key)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == meta["rows"]:
+            return cached[1]
+
+        columns = {}
+        for name, dtype in meta["columns"].items():
+            if meta["rows"] == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(os.path.join(self._folder(key), f"{name}.bin"), dtype=dtype, mode="r", shape=(meta["rows"],))
+        self._maps[key] = (meta["rows"], columns)
+        return columns
+
+    def append(self,key: str,columns: Dict[str, Any]) -> int:
+        """
+        Appends ticks to a contract. The ticks must come after the ones already stored.
+
+        Parameters:
+        -----------
+        key : str
+            Name of the contract.
+        columns : Dict[str, np.ndarray]
+            One array per field, with at least `date` and `ms_of_day` - e.g. the "numpy" output of the wrapper.
+
+        Returns:
+        --------
+        int
+            Number of rows appended.
+
+        Raises:
+        -------
+        ValueError:
+            If the ticks are missing date/ms_of_day, don't match the stored fields or overlap the stored ticks.
+        """
+        import numpy as np
+
+        if "date" not in columns or "ms_of_day" not in columns:
+            raise ValueError("Ticks need a date and a ms_of_day column")
+        ts = np.asarray(columns["date"], dtype=np.int64) * _DAY + np.asarray(columns["ms_of_day"], dtype=np.int64)
+        if len(ts) == 0:
+            return 0
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+
+        folder = self._folder(key)
+        os.makedirs(folder, exist_ok=True)
+        meta = self._meta(key)
+        if meta is None:
+            meta = {"rows": 0, "columns": {name: np.asarray(column).dtype.str for name, column in columns.items()}}
+            meta["columns"][_TS] = np.dtype(np.int64).str
+        else:
+            if set(meta["columns"]) != set(columns) | {_TS}:
+                raise ValueError(f"Fields {sorted(columns)} don't match the stored fields of {key}")
+            if meta["rows"] and ts[0] < self._columns(key)[_TS][-1]:
+                raise ValueError(f"Ticks overlap the ticks already stored for {key} - the store is append-only")
+
+        rows = meta["rows"]
+        for name, dtype in meta["columns"].items():
+            column = ts if name == _TS else np.asarray(columns[name])[order]
+            path = os.path.join(folder, f"{name}.bin")
+            with open(path, "ab") as f:
+                # Drop the tail of an append that crashed before its meta was written
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+
+        meta["rows"] = rows + len(ts)
+        self._write_meta(key, meta)
+        return len(ts)
+
+    def slice(self,key: str,start_date: int,end_date: Optional[int] = None,start_ms: int = 0
+              ,end_ms: int = 86_400_000,columns: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Returns the ticks of a contract from (start_date, start_ms) included to (end_date, end_ms) excluded,
+        as zero-copy views on the memmaps.
+
+        Parameters:
+        -----------
+        key : str
+            Name of the contract.
+        start_date, end_date : int
+            Dates of the window, YYYYMMDD - end_date defaults to start_date.
+        start_ms, end_ms : int
+            ms_of_day bounds of the window.
+        columns : Iterable[str], optional
+            Fields to return - all by default.
+
+        Returns:
+        --------
+        Dict[str, np.ndarray]
+        """
+        import numpy as np
+
+        stored = self._columns(key)
+        end_date = start_date if end_date is None else end_date
+        lo, hi = np.searchsorted(stored[_TS], [int(start_date)*_DAY + start_ms, int(end_date)*_DAY + end_ms])
+        names = [name for name in stored if name != _TS] if columns is None else list(columns)
+        return {name: stored[name][lo:hi] for name in names}
+
+    def fill_from(self,results: Iterable[Any]) -> int:
+        """
+        Appends the results of the AsyncFetcher fetched in "numpy" output - the results of fetch_all_contracts,
+        or the (idx, result) pairs collected from stream. A bulk result is split into its contracts. Results
+        without data are skipped.
+
+        Returns:
+        --------
+        int
+            Number of rows appended.
+        """
+        rows = 0
+        for result in results:
+            if isinstance(result, tuple):
+                _, result = result
+            if result.get("data") is None or result.get("url") is None:
+                continue
+            sec_type, req_type = result["url"].rstrip("/").split("/")[-2:]
+            for params, columns in _split_contracts(result["params"], result["data"]):
+                rows += self.append(_tick_key(sec_type, req_type, params), columns)
+        return rows
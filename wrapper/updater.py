@@ -0,0 +1,165 @@
+import copy
+import datetime as dt
+import inspect
+import logging
+from typing import List,Tuple,Optional,Iterable,Dict
+
+from .utils import _format_date
+from .wrapper import NoDataForContract
+from .cache import METADATA_CACHE
+from .store import _store_key
+
+logger = logging.getLogger(__name__)
+
+# req_type of a hist method -> list method giving the dates available for it
+LIST_DATES_METHODS = {
+    "option": {
+        "quote":"get_list_dates_quote"
+        ,"trade":"get_list_dates_trade"
+        ,"trade_quote":"get_list_dates_trade"
+        ,"ohlc":"get_list_dates_trade"
+        ,"eod":"get_list_dates_quote"
+        ,"open_interest":"get_list_dates_quote"
+        ,"implied_volatility":"get_list_dates_implied_volatility"
+        ,"implied_volatility_verbose":"get_list_dates_implied_volatility"
+        ,"greeks":"get_list_dates_implied_volatility"
+        ,"greeks_second_order":"get_list_dates_implied_volatility"
+        ,"greeks_third_order":"get_list_dates_implied_volatility"
+        ,"trade_greeks":"get_list_dates_trade"
+        ,"eod_quote_greeks":"get_list_dates_implied_volatility"
+    }
+    ,"stock": {
+        "quote":"get_list_expirations_quote"
+        ,"trade":"get_list_expirations_trade"
+        ,"ohlc":"get_list_expirations_trade"
+        ,"eod":"get_list_expirations_trade"
+    }
+}
+
+def _missing_ranges(available: List[int], stored: Iterable[int]) -> List[Tuple[int, int]]:
+    """
+    Groups the available dates that are not stored yet into runs of consecutive available dates.
+
+    Returns:
+        List[Tuple[int, int]]: (first, last) date of each run, in order.
+    """
+    stored = set(stored)
+    ranges, run = [], None
+    for date in sorted(available):
+        if date in stored:
+            run = None
+        elif run is None:
+            run = [date, date]
+            ranges.append(run)
+        else:
+            run[1] = date
+    return [tuple(run) for run in ranges]
+
+def _hist_params(contract, method: str, first: int, last: int, ivl: Optional[int]) -> Dict[str, object]:
+    """
+    Params of a hist method for a range of dates, following the method's own signature: the ivl is only
+    passed to the methods that take one - and EOD methods requiring one (stocks) get 0, as a day is the interval.
+    """
+    params = {"start_date": str(first), "end_date": str(last)}
+    parameter = inspect.signature(getattr(contract, method)).parameters.get("ivl")
+    if parameter is None:
+        return params
+    if ivl is None and parameter.default is inspect.Parameter.empty:
+        if not method.startswith("get_hist_eod"):
+            raise ValueError(f"{method} requires an ivl")
+        ivl = 0
+    if ivl is not None:
+        params["ivl"] = ivl
+    return params
+
+def sync_contract(contract, method: str, store, ivl: Optional[int] = None, start_date: Optional[str] = None) -> int:
+    """
+    Brings the local data of a contract up to date: compares the dates of the store with the dates the terminal
+    has for the req_type of `method`, and fetches and appends only the missing trading days.
+
+    Parameters:
+    -----------
+    contract : Option or Stock
+        The contract to update.
+    method : str
+        Historical method of the contract, e.g. "get_hist_quote".
+    store : CsvStore
+        Local store - any object with dates(contract, req_type), append(contract, req_type, df) and
+        drop_dates(contract, req_type, dates).
+    ivl : int, optional
+        Interval in seconds, for the methods that take one. If the last date stored is today, it is fetched
+        again and replaces the rows stored so far.
+    start_date : str, optional
+        Ignore the dates before it - defaults to the first date available.
+
+    Returns:
+    --------
+    int
+        Number of rows appended to the store.
+
+    Example:
+    --------
+    >>> store = CsvStore("./data")
+    >>> sync_contract(Option("SPY", "20231215", "C", 450), "get_hist_quote", store, ivl=60)
+    """
+    if not method.startswith("get_hist_"):
+        raise ValueError(f"{method} is not a hist method")
+    req_type = method[len("get_hist_"):]
+    list_method = LIST_DATES_METHODS.get(contract.sec_type, {}).get(req_type)
+    if list_method is None:
+        raise ValueError(f"No list of dates for {contract.sec_type} {req_type}")
+
+    # Work on a copy in records/pandas mode - the contract keeps its state and output
+    _contract = copy.copy(contract)
+    _contract.output = "records"
+    # The dates are listed again, not read from METADATA_CACHE - a day published since must not be missed
+    _contract._async = True
+    getattr(_contract, list_method)()
+    METADATA_CACHE.discard(_contract._metadata_key())
+    _contract._async = False
+    try:
+        available = [int(next(iter(row.values()))) for row in getattr(_contract, list_method)()]
+    except NoDataForContract:
+        return 0
+    if start_date is not None:
+        available = [date for date in available if date >= int(_format_date(start_date))]
+
+    key = _store_key(contract, req_type)
+    stored = store.dates(contract, req_type)
+    # Today may have been stored while the session was still open - fetched again, then replaced
+    today = int(dt.date.today().strftime("%Y%m%d"))
+    partial = bool(stored) and max(stored) == today
+    if partial:
+        stored = stored - {today}
+    rows = 0
+    _contract.output = "pandas"
+    for first, last in _missing_ranges(available, stored):
+        params = _hist_params(_contract, method, first, last, ivl)
+        try:
+            df = getattr(_contract, method)(**params)
+        except NoDataForContract:
+            continue
+        if df is None or len(df) == 0:
+            continue
+        if partial and first <= today <= last:
+            store.drop_dates(contract, req_type, [today])
+        store.append(contract, req_type, df)
+        rows += len(df)
+        logger.info("Appended %s rows to %s - %s to %s", len(df), key, first, last)
+    return rows
+
+def sync_contracts(contracts: Iterable, method: str, store, ivl: Optional[int] = None
+                   , start_date: Optional[str] = None) -> Dict[str, int]:
+    """
+    Runs `sync_contract` for each contract.
+
+    Returns:
+    --------
+    Dict[str, int]
+        Number of rows appended, per store key.
+    """
+    req_type = method[len("get_hist_"):]
+    return {
+        _store_key(contract, req_type): sync_contract(contract, method, store, ivl=ivl, start_date=start_date)
+        for contract in contracts
+    }
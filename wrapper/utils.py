@@ -1,6 +1,16 @@
 import datetime as dt
-import dateparser
+import hashlib
+import json
+from functools import lru_cache
+from typing import Union,Iterable,List
 
+try:
+    import orjson
+    _DEFAULT_JSON_LOADS = orjson.loads
+except ImportError:
+    _DEFAULT_JSON_LOADS = json.loads
+
+_json_loads = _DEFAULT_JSON_LOADS
 
 
 class ResponseFormatError(Exception):
@@ -9,30 +19,263 @@ class ResponseFormatError(Exception):
 class IVLError(Exception):
     pass
 
-def _format_date(date: str) -> str:
+def set_json_decoder(loads=None):
     """
-    Helper function to format date as "YYYYMMDD" if not already formatted.
+    Sets the function used to decode the raw payload of every response.
 
     Args:
-        date (str): The date string to format.
+        loads (callable): Function taking bytes and returning the decoded object (e.g. orjson.loads,
+            simdjson.loads). If None, goes back to orjson when installed, else the stdlib json.
+    """
+    global _json_loads
+    _json_loads = loads if loads is not None else _DEFAULT_JSON_LOADS
+
+def _decode_json(raw: bytes):
+    """
+    Decodes the raw payload of a response once with the current JSON decoder.
+
+    Args:
+        raw (bytes): The body of the HTTP response.
 
     Returns:
-        str: The formatted date string in the format "YYYYMMDD".
+        The decoded object.
+    """
+    if not raw:
+        raise ResponseFormatError("Response body is empty")
+    return _json_loads(raw)
+
+def _request_key(url: str, params: dict) -> str:
+    """
+    Content address of a query: hash of the url and of the params, without the None values and
+    regardless of their order or type (20230101 and "20230101" are the same query).
+
+    Args:
+        url (str): The url of the endpoint.
+        params (dict): The params of the query.
+
+    Returns:
+        str: The hex digest of the query.
+    """
+    return hashlib.sha256(json.dumps([url, _normalize_params(params)]).encode()).hexdigest()
+
+def _normalize_params(params: dict) -> list:
     """
+    Params of a query as sorted (name, value) string pairs, without the None values.
+    """
+    return sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+
+def _ymd(year: str, month: str, day: str):
+    """
+    Returns "YYYYMMDD" if year/month/day are digits of an existing date, else None.
+    """
+    if not (year.isdigit() and month.isdigit() and day.isdigit()):
+        return None
     try:
-        # Check if the time is already in the expected format
-        dt.datetime.strptime(date, '%Y%m%d')
-        return date
+        dt.date(int(year), int(month), int(day))
     except ValueError:
-        # Use dateparser to parse the time
-        _date = dateparser.parse(date)
-        if not _date :
-            raise ValueError("Date format isn't correct and (ideally) should be YYYYMMDD")
-        else:
-            return dt.datetime.strftime(_date, "%Y%m%d")
+        return None
+    return year + month + day
+
+@lru_cache(maxsize=4096)
+def _parse_date(date: str) -> str:
+    """
+    Slow path of _format_date - parses any date dateparser understands. Memoized, as the same few dates
+    (exp, start_date, end_date) are formatted over and over.
+    """
+    # dateparser loads its locale data on import - only pay for it when a date really needs parsing
+    import dateparser
+
+    _date = dateparser.parse(date)
+    if not _date :
+        raise ValueError("Date format isn't correct and (ideally) should be YYYYMMDD")
+    return dt.datetime.strftime(_date, "%Y%m%d")
+
+def _format_date(date: Union[str, int, dt.date]) -> str:
+    """
+    Helper function to format date as "YYYYMMDD" if not already formatted.
+
+    YYYYMMDD strings, YYYY-MM-DD (or YYYY/MM/DD) strings, YYYYMMDD integers and date/datetime objects
+    are handled without parsing, anything else goes through dateparser once and is then memoized.
+
+    Args:
+        date (str, int or date): The date to format.
+
+    Returns:
+        str: The formatted date string in the format "YYYYMMDD".
+    """
+    if isinstance(date, str):
+        _date = None
+        if len(date) == 8:
+            _date = _ymd(date[:4], date[4:6], date[6:])
+        elif len(date) == 10 and date[4] in "-/" and date[7] == date[4]:
+            _date = _ymd(date[:4], date[5:7], date[8:])
+        return _date if _date else _parse_date(date)
+
+    if isinstance(date, dt.date):
+        return date.strftime("%Y%m%d")
+
+    if isinstance(date, int) and not isinstance(date, bool):
+        _date = str(date)
+        if len(_date) == 8 and _ymd(_date[:4], _date[4:6], _date[6:]):
+            return _date
+
+    raise ValueError(f"Date format isn't correct and (ideally) should be YYYYMMDD - got {date!r}")
+
+def _format_dates(dates: Iterable[Union[str, int, dt.date]]) -> List[str]:
+    """
+    Batch version of _format_date, e.g. for the expirations of a chain.
+
+    YYYYMMDD and YYYY-MM-DD (or YYYY/MM/DD) strings and YYYYMMDD integers are split and checked as arrays,
+    only the leftovers (other formats, invalid dates) go through _format_date one by one.
+
+    Args:
+        dates (iterable): The dates to format.
+
+    Returns:
+        List[str]: The formatted dates, in the same order.
+    """
+    import numpy as np
+
+    dates = list(dates)
+    if not dates:
+        return []
+    values = np.asarray(dates).astype(str)
+    lengths = np.char.str_len(values)
+    chars = values.astype("U10").view("U1").reshape(len(values), 10)
+
+    iso = (lengths == 10) & np.isin(chars[:, 4], ["-", "/"]) & (chars[:, 7] == chars[:, 4])
+    digits = np.where(iso[:, None], chars[:, [0,1,2,3,5,6,8,9]], chars[:, :8])
+    ok = ((lengths == 8) | iso) & np.char.isdigit(digits).all(axis=1)
+    formatted = np.ascontiguousarray(digits).view("U8").ravel()
+
+    # Existing dates only: 1 <= month <= 12 and 1 <= day <= days of the month
+    ymd = np.where(ok, formatted, "19700101").astype(np.int64)
+    years, months, days = ymd // 10000, ymd // 100 % 100, ymd % 100
+    ok &= (months >= 1) & (months <= 12) & (days >= 1)
+    month = ((years - 1970)*12 + np.clip(months, 1, 12) - 1).astype("datetime64[M]")
+    ok &= days <= ((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64)
+
+    result = formatted.tolist()
+    for idx in np.flatnonzero(~ok):
+        result[idx] = _format_date(dates[idx])
+    return result
+
+# Timezone of the date/ms_of_day of the ticks
+EXCHANGE_TZ = "America/New_York"
+
+def _date_runs(date):
+    """
+    Splits a date column (YYYYMMDD integers) into runs of the same date - the ticks come sorted by date,
+    so there are only a few runs however many rows.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The date of each run as datetime64[ns] midnights, and its length.
+    """
+    import numpy as np
+
+    date = np.asarray(date)
+    starts = np.flatnonzero(np.concatenate(([True], date[1:] != date[:-1])))
+    days = date[starts].astype(np.int64)
+    years, months = days // 10000, days // 100 % 100
+    # datetime64 arithmetic: years since epoch -> + months -> days precision -> + days
+    days = ((years - 1970).astype("M8[Y]") + (months - 1).astype("m8[M]")).astype("M8[D]") + (days % 100 - 1).astype("m8[D]")
+    return days.astype("M8[ns]"), np.diff(np.append(starts, len(date)))
+
+def to_timestamps(date, ms_of_day):
+    """
+    Vectorized conversion of the date (YYYYMMDD integers) and ms_of_day columns into datetime64[ns], in
+    exchange wall-clock time. Each run of the same date is converted once, then the milliseconds are added
+    in bulk.
+
+    Args:
+        date (array-like): The date column, e.g. result["date"] in "numpy" output.
+        ms_of_day (array-like): The ms_of_day column, same length.
+
+    Returns:
+        np.ndarray: datetime64[ns] timestamps, not localized.
+    """
+    import numpy as np
+
+    if len(date) == 0:
+        return np.empty(0, dtype="M8[ns]")
+    days, lengths = _date_runs(date)
+    return np.repeat(days, lengths) + np.asarray(ms_of_day, dtype=np.int64).astype("m8[ms]")
+
+def _localize(timestamps, tz: str):
+    """
+    UTC nanoseconds of wall-clock timestamps. Wall-clock times repeated at the end of DST take their first
+    (DST) occurrence, the ones skipped at its start are shifted forward.
+    """
+    import numpy as np
+    import pandas as pd
+
+    index = pd.DatetimeIndex(timestamps).tz_localize(tz, ambiguous=np.ones(len(timestamps), dtype=bool), nonexistent="shift_forward")
+    return index.asi8
+
+def _timestamp_index(date, ms_of_day, tz: str = EXCHANGE_TZ):
+    """
+    DatetimeIndex of the ticks, localized to the exchange timezone. The UTC offset is looked up once per
+    run of the same date - only the rows of the days the offset changes are localized one by one.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if len(date) == 0:
+        return pd.DatetimeIndex([], dtype=f"datetime64[ns, {tz}]", name="timestamp")
+    days, lengths = _date_runs(date)
+    local = np.repeat(days, lengths).view(np.int64) + np.asarray(ms_of_day, dtype=np.int64) * 1_000_000
+
+    midnight = days.view(np.int64)
+    offset = midnight - _localize(days, tz)
+    changes = offset != (midnight + 86_399_999_999_999) - _localize(days + np.timedelta64(86_399_999_999_999, "ns"), tz)
+    utc = local - np.repeat(offset, lengths)
+    if changes.any():
+        rows = np.repeat(changes, lengths)
+        utc[rows] = _localize(local[rows].view("M8[ns]"), tz)
+
+    return pd.DatetimeIndex(utc.view("M8[ns]"), name="timestamp").tz_localize("UTC").tz_convert(tz)
+
+def _set_timestamp_index(df):
+    """
+    Indexes a DataFrame of ticks by their timestamp, keeping the date and ms_of_day columns. DataFrames
+    without both columns (e.g. list endpoints) are returned as is.
+    """
+    if "date" in df and "ms_of_day" in df:
+        df.index = _timestamp_index(df["date"].to_numpy(), df["ms_of_day"].to_numpy())
+    return df
+
+def _concat_columns(parts: List[dict], meta: List[dict] = None) -> dict:
+    """
+    Concatenates columnar results (dicts of NumPy arrays with the same fields) into one dict of arrays.
+
+    Args:
+        parts (List[dict]): The columnar results to concatenate, in order.
+        meta (List[dict]): Optional constant columns of each part (e.g. its root, exp, right, strike),
+            repeated over the rows of the part.
+
+    Returns:
+        dict: One array per field (and per meta column), or an empty dict if there are no parts.
+    """
+    import numpy as np
+
+    if not parts:
+        return {}
+    lengths = [len(next(iter(part.values()))) if part else 0 for part in parts]
+    columns = {}
+    if meta:
+        for key in meta[0]:
+            columns[key] = np.repeat(np.asarray([m[key] for m in meta]), lengths)
+    for key in parts[0]:
+        columns[key] = np.concatenate([part[key] for part in parts])
+    return columns
 
 def _isDateRangeValid(start_date,end_date):
-    if not dt.datetime.strptime(start_date,"%Y%m%d") <= dt.datetime.strptime(end_date,"%Y%m%d"):
+    start_date, end_date = str(start_date), str(end_date)
+    for date in (start_date, end_date):
+        if len(date) != 8 or _ymd(date[:4], date[4:6], date[6:]) is None:
+            raise ValueError(f"Date format isn't correct and should be YYYYMMDD - got {date!r}")
+    # Valid YYYYMMDD strings sort like the dates they represent
+    if not start_date <= end_date:
         raise ValueError("end_date must be greater than start_date")
     else:
         return True
@@ -1,6 +1,12 @@
 from typing import Dict,Any,Union,List
-import requests as rq
-from .utils import ResponseFormatError
+from .session import ThetaSession,get_default_session
+from .cache import ResponseCache,get_default_cache,METADATA_CACHE
+from .utils import ResponseFormatError,_decode_json,_concat_columns,_set_timestamp_index,_normalize_params
+from .schema import get_dtypes,_to_array,_to_frame
+from .metrics import _HOOKS,RequestTimer
+from .ratelimit import get_default_rate_limiter
+
+OUTPUT_MODES = ("records","numpy","pandas")
 
 class RootOrExpirationError(Exception):
     pass
@@ -8,12 +14,35 @@ class RootOrExpirationError(Exception):
 class NoDataForContract(Exception):
     pass
 
+class HTTPError(Exception):
+    def __init__(self,status_code):
+        super().__init__(f"HTTP error {status_code}")
+        self.status_code = status_code
+
 class MyWrapper:
-    def __init__(self,_async=False):
+    def __init__(self,_async=False,output="records",session: ThetaSession = None,cache: ResponseCache = None,typed=True,timestamps=True):
         """
         Initializes the MyWrapper class with the base url and call type.
+
+        Args:
+            _async (bool): If True, `_get_data` only returns the url and params so the request can be sent by the AsyncFetcher.
+            output (str): Shape of the parsed data - one of OUTPUT_MODES.
+                "records" returns a list of dicts (one per row),
+                "numpy" returns a dict of typed NumPy arrays (one per field of header['format']),
+                "pandas" returns a DataFrame built from those arrays.
+            session (ThetaSession): Pooled session used for the sync requests - defaults to the process-wide session,
+                looked up at each request so that set_default_session applies to the existing wrappers too.
+            cache (ResponseCache): On-disk cache of the historical responses - defaults to the process-wide cache, if any.
+            typed (bool): In columnar output, build each field with the compact dtype of the schema registry
+                (see wrapper.schema) instead of the dtype NumPy infers.
+            timestamps (bool): In "pandas" output, index the ticks by a datetime64[ns] timestamp in the exchange
+                timezone, built from the date and ms_of_day columns. False skips the conversion.
         """
-        self.base_url = "http://localhost:25510"
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"output must be one of {OUTPUT_MODES} - got {output}")
+
+        self._session = session
+        self.cache = cache if cache is not None else get_default_cache()
         self.call_type = None
         self.sec_type = None
         self.req_type = None
@@ -26,6 +55,51 @@ class MyWrapper:
         
         self.format = None
         self._async = _async
+        self.output = output
+        self.typed = typed
+        self.timestamps = timestamps
+
+    def __str__(self):
+        return f"{self.url}"
+
+    @property
+    def session(self) -> ThetaSession:
+        return self._session if self._session is not None else get_default_session()
+
+    @session.setter
+    def session(self, session: ThetaSession):
+        self._session = session
+
+    @property
+    def base_url(self) -> str:
+        return self.session.base_url
+
+    def _to_request(self, output: str = None) -> "MyWrapper":
+        """
+        Detaches the current query (url, params and types) into a bare MyWrapper in async mode, so it can be
+        sent by the AsyncFetcher while this object is reused to plan the next query.
+
+        Args:
+            output (str): Output mode of the request - defaults to self.output.
+
+        Returns:
+            MyWrapper: The detached request.
+        """
+        request = MyWrapper(_async=True, output=output or self.output, session=self._session, cache=self.cache, typed=self.typed, timestamps=self.timestamps)
+        request.call_type = self.call_type
+        request.sec_type = self.sec_type
+        request.req_type = self.req_type
+        request.url = self.url
+        request.params = dict(self.params)
+        return request
+
+    def fetch_sharded(self, method: str, start_date: str, end_date: str, ivl: int = None, shard_days: int = None, fetcher=None):
+        """
+        Fetches a long range of `method` as parallel day/week/month shards merged back in order.
+        See wrapper.shard.fetch_sharded.
+        """
+        from .shard import fetch_sharded
+        return fetch_sharded(self, method, start_date, end_date, ivl=ivl, shard_days=shard_days, fetcher=fetcher)
 
     def _isRequestOkay(self):
         if not self._async:
@@ -34,16 +108,48 @@ class MyWrapper:
                 return True
             else:
                 # If the request was not successful, raise an exception with the corresponding status code
-                raise Exception(f"HTTP error {self.request.status_code}")
+                raise HTTPError(self.request.status_code)
         else:
             if self.request.status == 200:
                 # If the status code indicates success, return True
                 return True
             else:
                 # If the status code indicates an error, raise an exception with the corresponding status code
-                raise Exception(f"HTTP error {self.request.status_code}")
+                raise HTTPError(self.request.status)
             
 
+    def _load_payload(self, raw: bytes):
+        """
+        Decodes the raw body of a response once and keeps its header and response.
+        Shared by the sync path and the AsyncFetcher.
+
+        Args:
+            raw (bytes): The body of the HTTP response.
+        """
+        payload = _decode_json(raw)
+        if not isinstance(payload, dict):
+            raise ResponseFormatError(f"Payload is {type(payload)} - should be dict")
+        self.header = payload.get('header')
+        self.response = payload.get('response')
+
+    def _read_cache(self):
+        """
+        Returns the raw response cached for the current url and params, or None.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get(self.url, self.params)
+
+    def _write_cache(self, raw: bytes):
+        if self.cache is not None:
+            self.cache.put(self.url, self.params, raw)
+
+    def _metadata_key(self):
+        """
+        Key of the list endpoints in METADATA_CACHE - the query actually sent, (url, normalized params).
+        """
+        return (self.url, tuple(_normalize_params(self.params)))
+
     def _isResponseOkay(self):
         if not self.response:
             raise NoDataForContract("Response content is empty")
@@ -70,10 +176,6 @@ class MyWrapper:
 
         """        
 
-        if not self._async:
-            _ = self.request.json()
-            self.header = _.get('header')
-
         err_type = self.header.get('error_type')
         err_msg = self.header.get('error_msg')
 
@@ -85,38 +187,127 @@ class MyWrapper:
         return True
     
     def _parse_data(self):
+        if self.call_type is not None and self.call_type.startswith("bulk"):
+            return self._parse_bulk_data()
+        if self.output != "records":
+            return self._parse_columns()
         if self.format is None:
             return [{self.req_type: element} for element in self.response]
         else:
             return [{key: element[idx] for idx, key in enumerate(self.format)} for element in self.response]
 
+    def _parse_columns(self):
+        """
+        Transposes the response into one typed NumPy array per field of the format, without
+        building an intermediate dict per row.
+
+        Returns:
+        A dict of NumPy arrays ("numpy" output) or a DataFrame ("pandas" output)
+        """
+        fields = [self.req_type] if self.format is None else self.format
+        dtypes = self._dtypes(fields)
+
+        if self.format is None:
+            columns = {self.req_type: _to_array(self.response, dtypes[self.req_type])}
+        else:
+            columns = {key: _to_array(column, dtypes[key]) for key, column in zip(self.format, zip(*self.response))}
+
+        if self.output == "pandas":
+            return self._to_frame(columns, dtypes)
+        return columns
+
+    def _dtypes(self, fields):
+        """
+        Dtype of each field - from the schema registry if typed, else None (inferred).
+        """
+        if not self.typed:
+            return {field: None for field in fields}
+        return get_dtypes(self.sec_type, self.req_type, fields)
+
+    def _to_frame(self, columns, dtypes):
+        """
+        DataFrame of the parsed columns, indexed by timestamp unless self.timestamps is False.
+        """
+        df = _to_frame(columns, dtypes)
+        return _set_timestamp_index(df) if self.timestamps else df
+
+    def _from_columns(self, columns):
+        """
+        Converts columns parsed in "numpy" output (e.g. by a worker process) to the output mode of this request.
+        """
+        if self.output == "numpy":
+            return columns
+        if self.output == "records":
+            keys = list(columns)
+            return [dict(zip(keys, row)) for row in zip(*(columns[key].tolist() for key in keys))]
+        dtypes = self._dtypes(list(columns))
+        if self.call_type is not None and self.call_type.startswith("bulk"):
+            dtypes = {**dtypes, "root": "category", "right": "category"}
+        return self._to_frame(columns, dtypes)
+
+    def _parse_bulk_data(self):
+        """
+        Splits the response of a bulk (expiration-wide) endpoint - a list of {"contract": ..., "ticks": [...]} -
+        back into rows (or columns) with the root, exp, right and strike of each contract.
+
+        Returns:
+        A list of dictionaries, a dict of NumPy arrays or a DataFrame depending on self.output
+        """
+        meta = [
+            {
+                "root": item["contract"]["root"]
+                ,"exp": item["contract"]["expiration"]
+                ,"right": item["contract"]["right"]
+                ,"strike": item["contract"]["strike"]
+            }
+            for item in self.response
+        ]
+
+        if self.output == "records":
+            return [{**contract, **dict(zip(self.format, tick))} for contract, item in zip(meta, self.response) for tick in item["ticks"]]
+
+        dtypes = self._dtypes(list(self.format) + ["exp", "strike"])
+        parts, contracts = [], []
+        for contract, item in zip(meta, self.response):
+            if item["ticks"]:
+                parts.append({key: _to_array(column, dtypes[key]) for key, column in zip(self.format, zip(*item["ticks"]))})
+                contracts.append(contract)
+        columns = _concat_columns(parts, contracts)
+        for key in ("exp", "strike"):
+            if key in columns:
+                columns[key] = _to_array(columns[key], dtypes[key])
+        if self.output == "pandas":
+            return self._to_frame(columns, {**dtypes, "root": "category", "right": "category"})
+        return columns
+
     def _parse_response(self):
         """
         This function checks the response to ensure that the format is valid and returns a list
         or a list of dictionaries, using the format from the header or in some cases, the req_type
-        from the query.
+        from the query. With a columnar output, the data is returned column by column instead
+        and the raw response is released once parsed.
 
         Returns:
-        A list or a list of dictionaries
+        A list of dictionaries, a dict of NumPy arrays or a DataFrame depending on self.output
 
         Raises:
         ResponseFormatError: if there is an error in the response
 
         """
-        if not self._async:
-            _ = self.request.json()
-            self.response = _.get('response')
-
         self.format = self.header.get('format')
         if self._isResponseOkay():
-            return self._parse_data()
+            data = self._parse_data()
+            # The raw rows are not needed anymore - don't keep a second copy of the payload around
+            self.response = None
+            return data
 
 
     def _get_data(self) -> List[Dict[str, Any]]:
         """Helper function that sends a GET request to the API endpoint and parses the response data.
 
         Returns:
-            A list of dictionaries, where each dictionary contains information about a specific contract.
+            A list of dictionaries, where each dictionary contains information about a specific contract
+            (or its columnar equivalent, see self.output).
 
         Raises:
             RootOrExpirationError: If the API returns an error message indicating that the provided root or expiration is nonexistent.
@@ -130,8 +321,90 @@ class MyWrapper:
                 ,"params":self.params
                 }
 
+        # Only time the requests when someone listens
+        if not _HOOKS:
+            return self._fetch_data()
+        timer = RequestTimer(self, "sync")
+        try:
+            data = self._fetch_data(timer)
+        except Exception as e:
+            timer.done(error=e, outcome="no_data" if isinstance(e, NoDataForContract) else None)
+            raise
+        timer.done(data)
+        return data
+
+    def _fetch_data(self, timer: RequestTimer = None):
+        """
+        Sync path of `_get_data` - from the metadata cache (list endpoints), the disk cache or the terminal.
+
+        Args:
+            timer (RequestTimer): Times each phase of the request, if given.
+        """
+        if self.call_type == "list":
+            key = self._metadata_key()
+            payload = METADATA_CACHE.get(key)
+            if payload is None:
+                raw = self._send(timer)
+                self._load_payload(raw)
+                if timer is not None:
+                    timer.lap("decode")
+            else:
+                self.header, self.response = payload
+                if timer is not None:
+                    timer.record["cached"] = True
+
+            if self._parse_header():
+                if payload is None:
+                    METADATA_CACHE.put(key, (self.header, self.response))
+                data = self._parse_response()
+                if timer is not None:
+                    timer.lap("parse")
+                return data
+
         else:
-            self.request = rq.get(self.url, params=self.params) 
-            if self._isRequestOkay() and self._parse_header():                
+            raw = self._read_cache()
+            cached = raw is not None
+            if timer is not None and self.cache is not None:
+                timer.lap("cache")
+            if cached:
+                if timer is not None:
+                    timer.record["cached"] = True
+                    timer.record["bytes"] = len(raw)
+            else:
+                raw = self._send(timer)
+
+            self._load_payload(raw)
+            if timer is not None:
+                timer.lap("decode")
+            if self._parse_header():
+                if not cached:
+                    self._write_cache(raw)
+                    if timer is not None:
+                        timer.skip()
                 data = self._parse_response()
-                return data
\ No newline at end of file
+                if timer is not None:
+                    timer.lap("parse")
+                return data
+
+    def _send(self, timer: RequestTimer = None) -> bytes:
+        """
+        Sends the sync request and returns the raw body of the response.
+        """
+        limiter = self.session.rate_limiter or get_default_rate_limiter()
+        slot = limiter.acquire() if limiter is not None else None
+        if timer is not None:
+            timer.lap("queue_wait")
+        try:
+            self.request = self.session.get(self.url, params=self.params)
+        finally:
+            if limiter is not None:
+                limiter.release(slot)
+        if timer is not None:
+            # requests reads the body before returning - elapsed stops at the headers
+            ttfb = self.request.elapsed.total_seconds()
+            timer.lap("download")
+            timer.record["download"] = max(0.0, timer.record["download"] - ttfb)
+            timer.record["ttfb"] = ttfb
+            timer.record["bytes"] = len(self.request.content)
+        if self._isRequestOkay():
+            return self.request.content